@@ -1319,7 +1319,7 @@ def api_analyze_medical_image():
         # Import and use medical image analyzer
         try:
             from src.ai.medical_image_analyzer import analyze_medical_image
-            result = analyze_medical_image(image_data, image_type, user_city, user_location)
+            result = analyze_medical_image(image_data, image_type, user_city, user_location, include_html=True)
             
             if result['success']:
                 print(f"✅ Medical image analysis completed successfully")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Build ahead-of-time compiled image kernels for FastMedicalAI
+Compiles src/ai/medical_kernels.py with numba.pycc into src/ai/medibot_kernels.*.so,
+which fast_medical_ai imports in preference to JIT compilation (no first-request warm-up)
+"""
+import os
+import sys
+
+# Add the project root to Python path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from numba.pycc import CC
+
+from src.ai import medical_kernels
+
+
+def build():
+    """Compile the kernels into an importable extension module next to fast_medical_ai"""
+    cc = CC('medibot_kernels')
+    cc.output_dir = os.path.join(PROJECT_ROOT, 'src', 'ai')
+    cc.verbose = True
+
+    cc.export('pixel_stats', 'UniTuple(f8, 5)(uint8[:, :, ::1])')(medical_kernels.pixel_stats)
+    cc.export('edge_count', 'i8(uint8[:, ::1], i8)')(medical_kernels.edge_count)
+
+    cc.compile()
+    print(f"✅ Kernels compiled into {cc.output_dir}")
+
+
+if __name__ == "__main__":
+    build()
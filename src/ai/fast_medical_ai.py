@@ -4,17 +4,749 @@ CHECKPOINT: Enhanced Medical AI System using OpenAI Vision
 Purpose: Intelligent medical image analysis using OpenAI's vision capabilities
 Uses the same OpenAI API key as the chatbot for professional medical analysis
 """
-import logging
-import base64
-import io
+import asyncio
+import copy
+import functools
+import hashlib
 import json
-import random
+import logging
 import os
-from typing import Dict, List, Any, Optional
-from PIL import Image
+import re
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, FrozenSet, List, Any, Mapping, NamedTuple, Optional
 import cv2
 import numpy as np
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+from src.ai import medical_kernels
+from src.ai.keyword_matcher import KeywordMatcher
+
+# SIMD-accelerated base64 when available (same API as the stdlib module)
+try:
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# xxh3 for content-addressed image caches when available; blake2b otherwise
+try:
+    import xxhash
+    
+    def _image_digest(image_data: bytes) -> bytes:
+        return xxhash.xxh3_128_digest(image_data)
+except ImportError:
+    def _image_digest(image_data: bytes) -> bytes:
+        return hashlib.blake2b(image_data, digest_size=16).digest()
+
+# Numeric kernels: ahead-of-time compiled (scripts/build_medical_kernels.py) > Numba JIT > NumPy/OpenCV
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    from src.ai import medibot_kernels as _aot_kernels
+    AOT_KERNELS_AVAILABLE = True
+except ImportError:
+    AOT_KERNELS_AVAILABLE = False
+
+FAST_KERNELS_AVAILABLE = AOT_KERNELS_AVAILABLE or NUMBA_AVAILABLE
+
+if AOT_KERNELS_AVAILABLE:
+    _pixel_stats_kernel = _aot_kernels.pixel_stats
+    _edge_count_kernel = _aot_kernels.edge_count
+elif NUMBA_AVAILABLE:
+    _pixel_stats_kernel = njit(cache=True, parallel=True, fastmath=True)(medical_kernels.pixel_stats)
+    _edge_count_kernel = njit(cache=True, parallel=True, fastmath=True)(medical_kernels.edge_count)
+
+if NUMBA_AVAILABLE:
+    _boost_confidences = njit(cache=True, fastmath=True)(medical_kernels.boost_confidences)
+else:
+    # Symptom category code -> (index into the urgent/melanoma/pneumonia flags, boost)
+    _CATEGORY_BOOSTS = {1: (0, 15), 2: (1, 20), 3: (2, 25)}
+
+    def _boost_confidences(is_urgent, has_melanoma, has_pneumonia, has_normal,
+                           category_code, high_contrast, base, jitter):
+        """Vectorized equivalent of medical_kernels.boost_confidences; the category boost is one masked add"""
+        category_flags = _CATEGORY_BOOSTS.get(category_code)
+        boosts = np.zeros(base.shape[0], dtype=np.int64)
+        if category_flags is not None:
+            flags = (is_urgent, has_melanoma, has_pneumonia)[category_flags[0]]
+            boosts += np.where(flags, category_flags[1], 0)
+        if high_contrast:
+            boosts += np.where(has_normal, 0, 10)
+        return np.clip(base + jitter + boosts, 30, 95).astype(np.float32)
+
+# Urgency levels as small integer codes for vectorized condition checks
+_URGENCY_CODES = {'LOW': 0, 'MODERATE': 1, 'HIGH': 2, 'URGENT': 3}
+
+# Symptom categories understood by the confidence-boost kernel (0 = no boost)
+_SYMPTOM_CATEGORY_CODES = {'urgent': 1, 'dermatology': 2, 'respiratory': 3}
+
+# orjson for the cached vision results when available; bytes in, bytes out either way
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+# pybase64 can encode straight to str, skipping the intermediate bytes object
+_B64_ENCODE_STR = getattr(_b64, 'b64encode_as_string', None)
+_DATA_URL_PREFIX = 'data:image/jpeg;base64,'
+
+# Structured-output schema so GPT-4o returns parsed JSON instead of free text
+_RESP_SCHEMA = {
+    "name": "medical_analysis",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "conditions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "confidence": {"type": "integer"},
+                        "description": {"type": "string"}
+                    },
+                    "required": ["name", "confidence", "description"],
+                    "additionalProperties": False
+                }
+            },
+            "recommendations": {"type": "array", "items": {"type": "string"}},
+            "specialist": {"type": "string"},
+            "urgency": {"type": "string", "enum": ["LOW", "MODERATE", "HIGH", "URGENT"]}
+        },
+        "required": ["summary", "conditions", "recommendations", "specialist", "urgency"],
+        "additionalProperties": False
+    }
+}
+
+# Condition-line parsing patterns
+_CONF_RE = re.compile(r'(\d{1,3})%')
+_STRIP_RE = re.compile(r'[(\-]\s*\d{1,3}%[)\s]*')
+_NORMAL_RE = re.compile(r'normal appearance|no obvious pathology|normal findings|healthy appearance|no concerns visible')
+
+# Specialist keywords looked for in AI responses (in order of specificity)
+_SPECIALIST_KEYWORDS = MappingProxyType({
+    'dermatologist': 'Dermatologist',
+    'orthopedist': 'Orthopedist', 
+    'orthopedic': 'Orthopedist',
+    'bone specialist': 'Orthopedist',
+    'fracture specialist': 'Orthopedist',
+    'radiologist': 'Radiologist',
+    'ophthalmologist': 'Ophthalmologist',
+    'eye specialist': 'Ophthalmologist',
+    'cardiologist': 'Cardiologist',
+    'heart specialist': 'Cardiologist',
+    'neurologist': 'Neurologist',
+    'brain specialist': 'Neurologist',
+    'neurosurgeon': 'Neurosurgeon',
+    'pulmonologist': 'Pulmonologist',
+    'lung specialist': 'Pulmonologist',
+    'oncologist': 'Oncologist',
+    'cancer specialist': 'Oncologist',
+    'gastroenterologist': 'Gastroenterologist',
+    'emergency medicine': 'Emergency Medicine',
+    'trauma surgeon': 'Trauma Surgeon',
+    'plastic surgeon': 'Plastic Surgeon',
+    'urologist': 'Urologist',
+    'endocrinologist': 'Endocrinologist',
+    'rheumatologist': 'Rheumatologist'
+})
+
+# Image type to specialist mapping, used when the response names no specialist
+_IMAGE_SPECIALIST_MAP = MappingProxyType({
+    # Bone/Orthopedic
+    'bone': 'Orthopedist',
+    'xray': 'Orthopedist',
+    'x-ray': 'Orthopedist', 
+    'fracture': 'Orthopedist',
+    'orthopedic': 'Orthopedist',
+    'joint': 'Orthopedist',
+    'spine': 'Orthopedist',
+
+    # Skin/Dermatology
+    'skin': 'Dermatologist',
+    'dermatology': 'Dermatologist',
+    'mole': 'Dermatologist',
+    'rash': 'Dermatologist',
+
+    # Eye/Ophthalmology
+    'eye': 'Ophthalmologist',
+    'retina': 'Ophthalmologist',
+    'ophthalmology': 'Ophthalmologist',
+
+    # Brain/Neurology
+    'brain': 'Neurologist',
+    'mri': 'Radiologist',  # MRI usually needs radiologist first
+    'neurological': 'Neurologist',
+    'head': 'Neurologist',
+
+    # Chest/Pulmonary
+    'chest': 'Pulmonologist',
+    'lung': 'Pulmonologist',
+    'pulmonary': 'Pulmonologist',
+    'ct': 'Radiologist',  # CT usually needs radiologist first
+
+    # Cardiac
+    'heart': 'Cardiologist',
+    'cardiac': 'Cardiologist',
+    'echo': 'Cardiologist',
+
+    # Abdomen
+    'abdomen': 'Gastroenterologist',
+    'stomach': 'Gastroenterologist',
+    'liver': 'Gastroenterologist',
+
+    # Normal/General
+    'normal': 'General Practitioner',
+    'selfie': 'General Practitioner',
+    'portrait': 'General Practitioner',
+    'photo': 'General Practitioner',
+    'general': 'General Practitioner',
+    'ultrasound': 'Radiologist',
+    'scan': 'Radiologist'
+})
+
+
+def _build_prefix_trie(mapping: Mapping[str, str]) -> Dict:
+    """Character trie (dict of dicts) over mapping's keys; a node's None entry holds the value"""
+    root: Dict = {}
+    for key, value in mapping.items():
+        node = root
+        for char in key:
+            node = node.setdefault(char, {})
+        node[None] = value
+    return root
+
+
+def _longest_prefix_value(trie: Dict, token: str) -> Optional[str]:
+    """Value of the longest trie key that is a prefix of token, or None"""
+    node, value = trie, None
+    for char in token:
+        node = node.get(char)
+        if node is None:
+            break
+        value = node.get(None, value)
+    return value
+
+
+# Compound image types ('chest_xray', 'skin lesion photo', 'lungs') resolved token by token
+_IMAGE_SPECIALIST_TRIE = _build_prefix_trie(_IMAGE_SPECIALIST_MAP)
+_IMAGE_TYPE_TOKEN_RE = re.compile(r'[\s_]+')
+
+# Image type descriptions used in the user prompt
+_IMAGE_DESCRIPTIONS = MappingProxyType({
+    'skin': 'dermatological',
+    'bone': 'bone/orthopedic (fracture analysis)',
+    'fracture': 'bone fracture (orthopedic)',
+    'xray': 'X-ray radiological',
+    'x-ray': 'X-ray radiological',
+    'eye': 'ophthalmological (retinal/eye)',
+    'mri': 'MRI neurological/radiological',
+    'ct': 'CT scan radiological',
+    'chest': 'chest/pulmonary',
+    'brain': 'neurological/brain'
+})
+
+# Section headings in free-text AI responses; 'conditions' wins when a line has several
+_SECTION_RE = re.compile(r'conditions|recommendations|next steps|red flags|urgent')
+_SECTION_MAP = {
+    'conditions': 'conditions',
+    'recommendations': 'recommendations',
+    'next steps': 'recommendations',
+    'red flags': 'recommendations',
+    'urgent': 'recommendations'
+}
+
+# Symptom hints for image-type detection; anchored at word starts so 'television' is not an eye hint
+_XRAY_SYM_RE = re.compile(r'\b(?:chest|cough|breathing)')
+_EYE_SYM_RE = re.compile(r'\b(?:vision|eye|blind|diabetes)')
+
+# Urgency cues in free-text AI responses; the most severe level found anywhere wins, not the first
+_URGENCY_RE = re.compile(
+    r'\b(?:(?P<URGENT>urgent|immediate|emergency)|(?P<HIGH>high|soon|promptly)|(?P<MODERATE>moderate|weeks))',
+    re.I
+)
+
+# First characters that mark a bullet or numbered line, and the prefix stripped from list items
+_BULLET_STARTS = frozenset('-*•0123456789')
+_BULLET_PREFIX_CHARS = '-*•0123456789. '
+
+# Constant recommendation strings for _generate_fast_recommendations
+_NO_CONDITION_REC = 'Professional medical evaluation recommended'
+_ROUTINE_RECS = ('📋 Routine medical consultation recommended',)
+# Opening recommendations indexed by urgency code (LOW, MODERATE, HIGH, URGENT)
+_URGENCY_RECS = (
+    _ROUTINE_RECS,
+    ('📅 Schedule appointment within 1-2 weeks',),
+    _ROUTINE_RECS,
+    (
+        '🚨 URGENT: Seek immediate medical attention',
+        '🏥 Consider emergency room or urgent care'
+    )
+)
+_GENERAL_RECS = (
+    '📸 Document any changes in symptoms',
+    '📱 Bring this analysis to your appointment',
+    '⚠️ Monitor for worsening symptoms'
+)
+
+
+@functools.lru_cache(maxsize=128)
+def _fast_recommendations_template(urgency_code: int, specialist: str, high_confidence: bool) -> tuple:
+    """
+    Fast-path recommendation lines for one (urgency, specialist, confidence) case, capped at six
+    Returns the lines and the index of the condition line, which holds a {condition_name} placeholder
+    """
+    opening = _URGENCY_RECS[urgency_code]
+    condition_line = ('🎯 High confidence finding: {condition_name}' if high_confidence
+                      else '🤔 Possible condition: {condition_name}')
+    lines = opening + (f'👨‍⚕️ Consultation with {specialist} recommended', condition_line) + _GENERAL_RECS
+    return lines[:6], len(opening) + 1
+
+# Description keywords that flag a condition as needing prompt attention
+_URGENT_RE = re.compile(r'evaluation|immediate|attention|bleeding|changing')
+
+# Features assumed when an image is missing or cannot be decoded
+_DEFAULT_IMAGE_FEATURES = MappingProxyType({
+    'width': 640,
+    'height': 480,
+    'brightness': 128,
+    'dominant_colors': [(128, 128, 128)],
+    'aspect_ratio': 1.33
+})
+
+@functools.lru_cache(maxsize=64)
+def _emergency_fallback_template(image_type: str, specialist: str) -> Mapping[str, Any]:
+    """Frozen emergency fallback result for one image type"""
+    summary = f"Medical image received for {image_type} analysis. Professional medical consultation strongly recommended for accurate diagnosis."
+    return MappingProxyType({
+        'success': True,
+        'summary': summary,
+        'analysis_summary': summary,
+        'conditions': [
+            {
+                'name': 'Professional Evaluation Required',
+                'confidence': 95,
+                'source': 'Medical Safety Protocol'
+            }
+        ],
+        'recommendations': [
+            'Consult with a qualified medical professional',
+            'Bring original image to medical appointment',
+            'Document any symptoms or changes',
+            'Seek urgent care if symptoms worsen'
+        ],
+        'confidence': 0.95,  # Expected as decimal
+        'overall_confidence': 95,
+        'analysis_methods': ['Medical Safety Protocol'],
+        'specialist_recommendation': specialist,  # Expected by main.py
+        'specialist_recommended': specialist,  # Keep both formats
+        'urgency': 'moderate',  # Expected by main.py (lowercase)
+        'urgency_level': 'MODERATE',  # Keep both formats
+        'processing_time_ms': 0
+    })
+
+# Static skeleton of the parse-failure fallback; None marks the per-call fields (kept for key order)
+_FALLBACK_SUMMARY = "Medical image analysis completed. Professional consultation recommended for accurate diagnosis."
+_FALLBACK_TEMPLATE = MappingProxyType({
+    'success': True,
+    'summary': _FALLBACK_SUMMARY,
+    'analysis_summary': _FALLBACK_SUMMARY,
+    'conditions': None,
+    'recommendations': None,
+    'confidence': 0.7,  # Expected as decimal
+    'overall_confidence': 70,
+    'analysis_methods': None,
+    'specialist_recommendation': None,  # Expected by main.py
+    'specialist_recommended': None,  # Keep both formats
+    'urgency': 'moderate',  # Expected by main.py (lowercase)
+    'urgency_level': 'MODERATE',  # Keep both formats
+    'processing_time_ms': 0
+})
+
+# CHECKPOINT: System prompt sections for the vision analysis (shared base + one specialty block)
+_BASE_MEDICAL_PROMPT = """You are an expert medical imaging AI with specialized training in clinical diagnosis. You help healthcare professionals analyze medical images with high accuracy.
+
+CORE MEDICAL IMAGING PRINCIPLES:
+- Use evidence-based diagnostic criteria
+- Apply appropriate medical terminology
+- Consider differential diagnoses systematically
+- Assess urgency levels accurately
+- Recommend correct medical specialists
+- Always emphasize professional medical consultation
+
+IMPORTANT: NON-MEDICAL IMAGE DETECTION
+- If this appears to be a normal selfie, portrait, or non-medical photo without obvious medical concerns, clearly state this
+- For normal appearance without visible pathology, indicate "Normal appearance - no obvious medical concerns visible"
+- Still provide educational information about when to seek medical care
+- Recommend routine check-ups even for normal-appearing images
+
+REQUIRED RESPONSE FORMAT:
+1. INITIAL OBSERVATIONS: Describe what you see clinically (or if it appears normal/non-medical)
+2. POSSIBLE CONDITIONS: List 2-4 conditions with confidence percentages (0-100%) OR state "Normal appearance - no obvious pathology" (100%)
+3. SPECIALIST RECOMMENDATION: Choose the most appropriate medical specialist OR "Routine care with General Practitioner"
+4. URGENCY LEVEL: LOW/MODERATE/HIGH/URGENT based on findings (LOW for normal images)
+5. RED FLAGS: Any concerning features requiring immediate attention OR "No red flags observed"
+6. NEXT STEPS: Practical recommendations for patient care (routine screening for normal images)"""
+
+_DERMATOLOGY_PROMPT = """
+
+🔬 DERMATOLOGY SPECIALIST ANALYSIS:
+EXAMINE FOR:
+- ABCDE criteria: Asymmetry, Border irregularity, Color variation, Diameter >6mm, Evolution
+- Pigmentation patterns: uniform vs irregular, new vs changing lesions
+- Surface texture: smooth, rough, scaly, ulcerated, raised, flat
+- Vascular patterns: telangiectasias, inflammation, bleeding
+- Distribution patterns: localized vs widespread, symmetric vs asymmetric
+
+CONDITION CATEGORIES TO CONSIDER:
+- Malignant: Melanoma, Basal cell carcinoma, Squamous cell carcinoma
+- Benign: Seborrheic keratosis, Dermatofibroma, Benign nevi
+- Inflammatory: Eczema, Psoriasis, Contact dermatitis, Rosacea
+- Infectious: Bacterial, Fungal, Viral infections
+- Vascular: Hemangiomas, Spider angiomas, Purpura
+
+SPECIALIST: Always recommend DERMATOLOGIST for skin conditions
+URGENCY ASSESSMENT:
+- URGENT: Rapidly changing lesions, ulceration, bleeding, irregular borders
+- HIGH: New pigmented lesions, suspicious features
+- MODERATE: Persistent lesions, inflammatory conditions
+- LOW: Stable benign-appearing lesions"""
+
+_ORTHOPEDIC_PROMPT = """
+
+🦴 ORTHOPEDIC/RADIOLOGY SPECIALIST ANALYSIS:
+EXAMINE FOR:
+- Bone continuity: Complete vs incomplete fractures, displacement
+- Fracture patterns: Transverse, oblique, spiral, comminuted, greenstick
+- Joint alignment: Dislocations, subluxations, joint space narrowing
+- Bone density: Osteoporosis, sclerosis, lytic lesions
+- Soft tissue: Swelling, foreign bodies, gas patterns
+
+CONDITION CATEGORIES TO CONSIDER:
+- Acute fractures: Simple, compound, displaced, non-displaced
+- Chronic conditions: Arthritis, osteoporosis, bone tumors
+- Joint pathology: Dislocations, torn ligaments, cartilage damage
+- Developmental: Growth plate injuries, congenital abnormalities
+- Infectious: Osteomyelitis, septic arthritis
+
+SPECIALIST RECOMMENDATIONS:
+- ORTHOPEDIST: For fractures, joint injuries, bone conditions
+- RADIOLOGIST: For complex imaging interpretation
+- EMERGENCY MEDICINE: For acute traumatic injuries
+
+URGENCY ASSESSMENT:
+- URGENT: Open fractures, neurovascular compromise, severe displacement
+- HIGH: Acute fractures, joint dislocations, suspected infections
+- MODERATE: Chronic arthritis, minor fractures
+- LOW: Old healed fractures, mild degenerative changes"""
+
+_OPHTHALMOLOGY_PROMPT = """
+
+👁️ OPHTHALMOLOGY SPECIALIST ANALYSIS:
+EXAMINE FOR:
+- Optic disc: Cupping, pallor, swelling, hemorrhages
+- Macula: Drusen, hemorrhages, exudates, pigmentation
+- Retinal vessels: Caliber, arteriovenous nicking, hemorrhages
+- Background retina: Cotton wool spots, hard exudates, microaneurysms
+- Overall clarity: Media opacities, vitreous changes
+
+CONDITION CATEGORIES TO CONSIDER:
+- Diabetic retinopathy: Non-proliferative vs proliferative
+- Glaucoma: Optic nerve cupping, visual field defects
+- Macular degeneration: Wet vs dry, geographic atrophy
+- Hypertensive retinopathy: Arterial changes, hemorrhages
+- Vascular occlusions: Central vs branch retinal artery/vein occlusion
+
+SPECIALIST: Always recommend OPHTHALMOLOGIST for eye conditions
+URGENCY ASSESSMENT:
+- URGENT: Acute vision loss, retinal detachment, acute angle closure
+- HIGH: New hemorrhages, proliferative retinopathy, optic nerve swelling
+- MODERATE: Mild diabetic changes, early glaucoma
+- LOW: Stable chronic conditions, minor refractive errors"""
+
+_NEUROLOGY_PROMPT = """
+
+🧠 NEUROLOGICAL/RADIOLOGY SPECIALIST ANALYSIS:
+EXAMINE FOR:
+- Brain structures: Gray-white matter differentiation, ventricles, sulci
+- Signal abnormalities: T1/T2 changes, enhancement patterns
+- Mass effects: Midline shift, herniation, compression
+- Vascular patterns: Infarcts, hemorrhages, aneurysms
+- Spinal structures: Cord compression, disc herniations, stenosis
+
+CONDITION CATEGORIES TO CONSIDER:
+- Stroke: Acute infarct, hemorrhage, chronic changes
+- Tumors: Primary brain tumors, metastases, benign masses
+- Inflammatory: Multiple sclerosis, encephalitis, abscess
+- Degenerative: Alzheimer's, spine degeneration, cord compression
+- Traumatic: Hematomas, contusions, diffuse axonal injury
+
+SPECIALIST RECOMMENDATIONS:
+- NEUROLOGIST: For brain conditions, stroke, degenerative diseases
+- NEUROSURGEON: For surgical conditions, tumors, spine surgery
+- RADIOLOGIST: For complex imaging interpretation
+
+URGENCY ASSESSMENT:
+- URGENT: Acute stroke, large hemorrhages, herniation
+- HIGH: New tumors, significant compression, acute inflammation
+- MODERATE: Chronic conditions, mild degenerative changes
+- LOW: Stable chronic findings, minor age-related changes"""
+
+_PULMONARY_PROMPT = """
+
+🫁 PULMONARY/RADIOLOGY SPECIALIST ANALYSIS:
+EXAMINE FOR:
+- Lung parenchyma: Consolidation, ground glass, nodules, masses
+- Pleural spaces: Effusions, pneumothorax, pleural thickening
+- Mediastinum: Lymphadenopathy, masses, vascular structures
+- Airways: Bronchial wall thickening, tree-in-bud pattern
+- Cardiac silhouette: Size, shape, calcifications
+
+CONDITION CATEGORIES TO CONSIDER:
+- Infectious: Pneumonia, tuberculosis, abscess
+- Malignant: Lung cancer, metastases, lymphoma
+- Inflammatory: Asthma, COPD, interstitial lung disease
+- Vascular: Pulmonary embolism, edema, hypertension
+- Traumatic: Pneumothorax, rib fractures, contusions
+
+SPECIALIST RECOMMENDATIONS:
+- PULMONOLOGIST: For lung diseases, breathing problems
+- RADIOLOGIST: For imaging interpretation
+- CARDIOLOGIST: For cardiac-related findings
+- ONCOLOGIST: For suspected malignancies
+
+URGENCY ASSESSMENT:
+- URGENT: Large pneumothorax, massive PE, acute respiratory failure
+- HIGH: New masses, significant pneumonia, pleural effusions
+- MODERATE: Chronic COPD, stable nodules
+- LOW: Minor findings, chronic stable conditions"""
+
+_GENERAL_PROMPT = """
+
+🏥 GENERAL MEDICAL IMAGE ANALYSIS:
+EXAMINE FOR:
+- Anatomical structures: Normal vs abnormal anatomy
+- Pathological changes: Masses, inflammation, trauma
+- Systematic assessment: Size, shape, density, enhancement
+- Clinical correlation: Symptoms matching findings
+
+SPECIALIST RECOMMENDATIONS BASED ON ANATOMY:
+- RADIOLOGIST: For complex imaging interpretation
+- EMERGENCY MEDICINE: For acute traumatic injuries
+- INTERNAL MEDICINE: For general medical conditions
+- Organ-specific specialists based on findings
+
+URGENCY ASSESSMENT:
+- URGENT: Life-threatening findings, acute trauma
+- HIGH: New concerning findings requiring prompt evaluation
+- MODERATE: Chronic conditions, stable findings
+- LOW: Minor or incidental findings"""
+
+# Image type aliases that select each specialty block; anything else gets _GENERAL_PROMPT
+_PROMPT_SECTIONS = {
+    **dict.fromkeys(['skin', 'dermatology'], _DERMATOLOGY_PROMPT),
+    **dict.fromkeys(['bone', 'xray', 'x-ray', 'fracture', 'orthopedic'], _ORTHOPEDIC_PROMPT),
+    **dict.fromkeys(['eye', 'retina', 'ophthalmology'], _OPHTHALMOLOGY_PROMPT),
+    **dict.fromkeys(['mri', 'brain', 'spine', 'neurological'], _NEUROLOGY_PROMPT),
+    **dict.fromkeys(['ct', 'chest', 'pulmonary', 'lung'], _PULMONARY_PROMPT)
+}
+
+@functools.lru_cache(maxsize=16)
+def _build_medical_prompt(image_type: str) -> str:
+    """
+    CHECKPOINT: Enhanced Medical Analysis Prompt Generator
+    Purpose: Creates highly specialized prompts for accurate medical image analysis
+    Trained for: skin, bone/xray, eye, mri, ct, ultrasound, and general medical images
+    """
+    return _BASE_MEDICAL_PROMPT + _PROMPT_SECTIONS.get(image_type, _GENERAL_PROMPT)
+
+# CHECKPOINT: User prompt templates - {description} and {symptoms_block} are filled per request
+_USER_PROMPT_HEAD = "Please analyze this {description} medical image."
+
+_BONE_FOCUS = """
+
+🦴 BONE/FRACTURE ANALYSIS FOCUS:
+This appears to be a bone/orthopedic image. Please focus on:
+- Fracture identification and classification
+- Bone alignment and displacement
+- Joint integrity and spacing
+- Recommend ORTHOPEDIST as the primary specialist"""
+
+_SKIN_FOCUS = """
+
+🔬 SKIN ANALYSIS FOCUS:
+This appears to be a dermatological image. Please focus on:
+- ABCDE criteria for skin lesions
+- Color, texture, and border analysis
+- Recommend DERMATOLOGIST as the primary specialist"""
+
+_EYE_FOCUS = """
+
+👁️ EYE ANALYSIS FOCUS:
+This appears to be an ophthalmological image. Please focus on:
+- Retinal structures and abnormalities
+- Optic disc and macula assessment
+- Recommend OPHTHALMOLOGIST as the primary specialist"""
+
+_USER_PROMPT_TAIL = """\n\nPlease provide:
+1. A clear summary of what you observe in this {description} image
+2. List possible conditions with confidence percentages (0-100%) OR if normal: "Normal appearance - no obvious pathology (100%)"
+3. Recommended SPECIALIST TYPE (be specific - Orthopedist for bones/fractures, Dermatologist for skin, etc.) OR "General Practitioner" for normal images
+4. Urgency level (LOW/MODERATE/HIGH/URGENT) - use LOW for normal/healthy appearances
+5. Practical next steps for the patient
+
+IMPORTANT: Make sure your specialist recommendation matches the image type!
+- Bone/Fracture images → ORTHOPEDIST
+- Skin images → DERMATOLOGIST  
+- Eye images → OPHTHALMOLOGIST
+- Brain/MRI → NEUROLOGIST
+- Chest/Lung → PULMONOLOGIST
+- Normal selfies/portraits → GENERAL PRACTITIONER
+
+SPECIAL CASE - NORMAL PHOTOS:
+If this appears to be a normal selfie, portrait, or photo without obvious medical concerns:
+- State "Normal appearance - no obvious medical concerns visible"
+- List condition as "Normal appearance - no obvious pathology (100%)"
+- Recommend "General Practitioner" for routine care
+- Set urgency as "LOW"
+- Suggest routine check-ups and preventive care
+
+Format your response clearly with numbered sections."""
+
+_BONE_TEMPLATE = _USER_PROMPT_HEAD + _BONE_FOCUS + "{symptoms_block}" + _USER_PROMPT_TAIL
+_SKIN_TEMPLATE = _USER_PROMPT_HEAD + _SKIN_FOCUS + "{symptoms_block}" + _USER_PROMPT_TAIL
+_EYE_TEMPLATE = _USER_PROMPT_HEAD + _EYE_FOCUS + "{symptoms_block}" + _USER_PROMPT_TAIL
+_DEFAULT_USER_TEMPLATE = _USER_PROMPT_HEAD + "{symptoms_block}" + _USER_PROMPT_TAIL
+
+_USER_PROMPT_TEMPLATES = {
+    **dict.fromkeys(['bone', 'fracture', 'xray', 'x-ray'], _BONE_TEMPLATE),
+    **dict.fromkeys(['skin', 'dermatology'], _SKIN_TEMPLATE),
+    **dict.fromkeys(['eye', 'retina', 'ophthalmology'], _EYE_TEMPLATE)
+}
+
+class Condition(NamedTuple):
+    """Knowledge-base condition; immutable, so every request can share one instance"""
+    name: str
+    severity: str
+    urgency: str
+
+
+class SymptomScan(NamedTuple):
+    """Symptoms lowercased and matched once per request, shared by every analysis helper"""
+    text: str
+    keywords: FrozenSet[str]
+    groups: FrozenSet[str]
+
+
+_EMPTY_SCAN = SymptomScan('', frozenset(), frozenset())
+
+
+# CHECKPOINT: Enhanced medical knowledge base for comprehensive image types
+# Built once at import and frozen; requests read it without copying
+_MEDICAL_KNOWLEDGE = MappingProxyType({
+    'skin': MappingProxyType({
+        'conditions': (
+            Condition('Melanoma', 'High', 'URGENT'),
+            Condition('Basal Cell Carcinoma', 'Moderate', 'MODERATE'),
+            Condition('Actinic Keratosis', 'Low', 'LOW'),
+            Condition('Seborrheic Keratosis', 'Low', 'LOW'),
+            Condition('Eczema', 'Low', 'LOW'),
+            Condition('Psoriasis', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Dermatologist'
+    }),
+    'bone': MappingProxyType({
+        'conditions': (
+            Condition('Acute Fracture', 'High', 'URGENT'),
+            Condition('Displaced Fracture', 'High', 'URGENT'), 
+            Condition('Simple Fracture', 'Moderate', 'HIGH'),
+            Condition('Hairline Fracture', 'Moderate', 'MODERATE'),
+            Condition('Arthritis', 'Low', 'LOW'),
+            Condition('Osteoporosis', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Orthopedist'
+    }),
+    'xray': MappingProxyType({
+        'conditions': (
+            Condition('Fracture', 'High', 'URGENT'),
+            Condition('Dislocation', 'High', 'URGENT'),
+            Condition('Pneumonia', 'High', 'URGENT'),
+            Condition('Pneumothorax', 'High', 'URGENT'),
+            Condition('Cardiomegaly', 'Moderate', 'MODERATE'),
+            Condition('Pleural Effusion', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Orthopedist'  # Most X-rays are bone-related
+    }),
+    'fracture': MappingProxyType({
+        'conditions': (
+            Condition('Complete Fracture', 'High', 'URGENT'),
+            Condition('Incomplete Fracture', 'Moderate', 'HIGH'),
+            Condition('Stress Fracture', 'Moderate', 'MODERATE'),
+            Condition('Avulsion Fracture', 'Moderate', 'MODERATE'),
+            Condition('Pathological Fracture', 'High', 'URGENT')
+        ),
+        'specialist': 'Orthopedist'
+    }),
+    'eye': MappingProxyType({
+        'conditions': (
+            Condition('Diabetic Retinopathy', 'High', 'URGENT'),
+            Condition('Glaucoma', 'High', 'MODERATE'),
+            Condition('Macular Degeneration', 'Moderate', 'MODERATE'),
+            Condition('Retinal Detachment', 'High', 'URGENT'),
+            Condition('Normal Fundus', 'Normal', 'LOW')
+        ),
+        'specialist': 'Ophthalmologist'
+    }),
+    'brain': MappingProxyType({
+        'conditions': (
+            Condition('Stroke', 'High', 'URGENT'),
+            Condition('Brain Tumor', 'High', 'URGENT'),
+            Condition('Hemorrhage', 'High', 'URGENT'),
+            Condition('Aneurysm', 'High', 'URGENT'),
+            Condition('Multiple Sclerosis', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Neurologist'
+    }),
+    'chest': MappingProxyType({
+        'conditions': (
+            Condition('Pneumonia', 'High', 'URGENT'),
+            Condition('Lung Cancer', 'High', 'URGENT'),
+            Condition('Pneumothorax', 'High', 'URGENT'),
+            Condition('Pulmonary Edema', 'High', 'URGENT'),
+            Condition('COPD', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Pulmonologist'
+    }),
+    'heart': MappingProxyType({
+        'conditions': (
+            Condition('Myocardial Infarction', 'High', 'URGENT'),
+            Condition('Cardiomyopathy', 'High', 'HIGH'),
+            Condition('Valve Disease', 'Moderate', 'MODERATE'),
+            Condition('Arrhythmia', 'Moderate', 'MODERATE')
+        ),
+        'specialist': 'Cardiologist'
+    }),
+    'normal': MappingProxyType({
+        'conditions': (
+            Condition('Normal appearance - no obvious pathology', 'Normal', 'LOW'),
+            Condition('Healthy appearance', 'Normal', 'LOW'),
+            Condition('No concerning features observed', 'Normal', 'LOW')
+        ),
+        'specialist': 'General Practitioner'
+    })
+})
+
 
 class FastMedicalAI:
     """
@@ -28,113 +760,56 @@ class FastMedicalAI:
         
         # CHECKPOINT: Initialize OpenAI client with API key
         self.openai_client = None
+        self.async_client = None
         self.openai_available = False
         
+        # Bounded LRU of decoded BGR arrays, keyed by a digest of the raw upload
+        self._decode_cache: OrderedDict = OrderedDict()
+        self._decode_cache_size = 32
+        # Every LRU below is shared by concurrent requests on the module-level instance, so each
+        # one's lookup/move_to_end and insert/evict sequences run under its own lock
+        self._decode_cache_lock = threading.Lock()
+        
+        # Bounded LRU of fast-path image features, keyed like the decode cache
+        self._feature_cache: OrderedDict = OrderedDict()
+        self._feature_cache_size = 128
+        self._feature_cache_lock = threading.Lock()
+        
+        # Bounded LRU of serialized vision results; loading on hit hands out a fresh copy
+        self._vision_cache: OrderedDict = OrderedDict()
+        self._vision_cache_size = 128
+        self._vision_cache_lock = threading.Lock()
+        
+        # Bounded LRU of parsed free-text responses; the response text itself is the key
+        self._parse_cache: OrderedDict = OrderedDict()
+        self._parse_cache_size = 64
+        self._parse_cache_lock = threading.Lock()
+        
+        # PCG64 generator for the confidence jitter, drawn in batches
+        self._rng = np.random.default_rng()
+        
         # Try to initialize OpenAI
         try:
             api_key = os.getenv('OPENAI_API_KEY')
             if api_key:
                 self.openai_client = OpenAI(api_key=api_key)
+                self.async_client = AsyncOpenAI(api_key=api_key)
                 self.openai_available = True
                 self.logger.info("✅ OpenAI Vision initialized for medical analysis")
             else:
                 self.logger.warning("⚠ OpenAI API key not found, using fallback analysis")
         except Exception as e:
-            self.logger.error(f"❌ OpenAI initialization failed: {e}")
-        
-        # CHECKPOINT: Enhanced medical knowledge base for comprehensive image types
-        self.medical_knowledge = {
-            'skin': {
-                'conditions': [
-                    {'name': 'Melanoma', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Basal Cell Carcinoma', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Actinic Keratosis', 'severity': 'Low', 'urgency': 'LOW'},
-                    {'name': 'Seborrheic Keratosis', 'severity': 'Low', 'urgency': 'LOW'},
-                    {'name': 'Eczema', 'severity': 'Low', 'urgency': 'LOW'},
-                    {'name': 'Psoriasis', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Dermatologist'
-            },
-            'bone': {
-                'conditions': [
-                    {'name': 'Acute Fracture', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Displaced Fracture', 'severity': 'High', 'urgency': 'URGENT'}, 
-                    {'name': 'Simple Fracture', 'severity': 'Moderate', 'urgency': 'HIGH'},
-                    {'name': 'Hairline Fracture', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Arthritis', 'severity': 'Low', 'urgency': 'LOW'},
-                    {'name': 'Osteoporosis', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Orthopedist'
-            },
-            'xray': {
-                'conditions': [
-                    {'name': 'Fracture', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Dislocation', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Pneumonia', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Pneumothorax', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Cardiomegaly', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Pleural Effusion', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Orthopedist'  # Most X-rays are bone-related
-            },
-            'fracture': {
-                'conditions': [
-                    {'name': 'Complete Fracture', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Incomplete Fracture', 'severity': 'Moderate', 'urgency': 'HIGH'},
-                    {'name': 'Stress Fracture', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Avulsion Fracture', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Pathological Fracture', 'severity': 'High', 'urgency': 'URGENT'}
-                ],
-                'specialist': 'Orthopedist'
-            },
-            'eye': {
-                'conditions': [
-                    {'name': 'Diabetic Retinopathy', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Glaucoma', 'severity': 'High', 'urgency': 'MODERATE'},
-                    {'name': 'Macular Degeneration', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Retinal Detachment', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Normal Fundus', 'severity': 'Normal', 'urgency': 'LOW'}
-                ],
-                'specialist': 'Ophthalmologist'
-            },
-            'brain': {
-                'conditions': [
-                    {'name': 'Stroke', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Brain Tumor', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Hemorrhage', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Aneurysm', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Multiple Sclerosis', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Neurologist'
-            },
-            'chest': {
-                'conditions': [
-                    {'name': 'Pneumonia', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Lung Cancer', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Pneumothorax', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Pulmonary Edema', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'COPD', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Pulmonologist'
-            },
-            'heart': {
-                'conditions': [
-                    {'name': 'Myocardial Infarction', 'severity': 'High', 'urgency': 'URGENT'},
-                    {'name': 'Cardiomyopathy', 'severity': 'High', 'urgency': 'HIGH'},
-                    {'name': 'Valve Disease', 'severity': 'Moderate', 'urgency': 'MODERATE'},
-                    {'name': 'Arrhythmia', 'severity': 'Moderate', 'urgency': 'MODERATE'}
-                ],
-                'specialist': 'Cardiologist'
-            },
-            'normal': {
-                'conditions': [
-                    {'name': 'Normal appearance - no obvious pathology', 'severity': 'Normal', 'urgency': 'LOW'},
-                    {'name': 'Healthy appearance', 'severity': 'Normal', 'urgency': 'LOW'},
-                    {'name': 'No concerning features observed', 'severity': 'Normal', 'urgency': 'LOW'}
-                ],
-                'specialist': 'General Practitioner'
-            }
+            self.logger.error("❌ OpenAI initialization failed: %s", e)
+        
+        self.medical_knowledge = _MEDICAL_KNOWLEDGE
+        
+        # Per image type (summary, conditions) generators; anything else uses the general pair
+        self._dispatch = {
+            'skin': (self._generate_skin_analysis, self._analyze_skin_condition),
+            'xray': (self._generate_xray_analysis, self._analyze_xray_condition),
+            'eye': (self._generate_eye_analysis, self._analyze_eye_condition),
         }
+        self._general_pair = (self._generate_general_analysis, self._analyze_general_condition)
         
         # Symptom keywords for intelligent matching
         self.symptom_keywords = {
@@ -145,33 +820,87 @@ class FastMedicalAI:
             'respiratory': ['cough', 'shortness of breath', 'wheeze', 'fever'],
             'cardiac': ['chest pain', 'palpitations', 'fatigue', 'swelling']
         }
+        
+        # Specialist mentions and normal-finding phrases in AI responses, checked in one pass
+        self._specialist_matcher = KeywordMatcher({
+            'normal': ['normal appearance', 'no obvious pathology', 'healthy appearance', 'no concerns',
+                       'general practitioner', 'routine care'],
+            'specialist': list(_SPECIALIST_KEYWORDS)
+        })
+        self._specialist_priority = {keyword: i for i, keyword in enumerate(_SPECIALIST_KEYWORDS)}
+        
+        # Frozen keyword sets per category for O(1) membership against matched keywords
+        self._keyword_sets = {category: frozenset(keywords) for category, keywords in self.symptom_keywords.items()}
+        self._urgent_set = self._keyword_sets['urgent']
+        
+        # One automaton over every symptom category plus the skin-specific cues used by the
+        # skin summary and condition rules; _scan_symptoms runs it once per request
+        self._symptom_matcher = KeywordMatcher({
+            **self.symptom_keywords,
+            'skin_concerning': ['bleeding', 'itchy', 'growing', 'changing'],
+            'skin_pain': ['pain', 'burning', 'tender'],
+            'skin_lesion_change': ['bleeding', 'growing', 'changing', 'irregular'],
+            'skin_irritation': ['itchy', 'rash', 'red', 'inflamed'],
+            'skin_dry': ['dry', 'scaly', 'flaky']
+        })
+        
+        # Per-condition flags for the confidence-boost kernel, keyed by condition list identity
+        self._condition_arrays = {}
+        for entry in self.medical_knowledge.values():
+            self._get_condition_arrays(entry['conditions'])
+        
+        # Static fields of each prediction dict; requests copy a template and fill in the confidence
+        self._prediction_templates = {
+            condition: {
+                'name': condition.name,
+                'confidence': 0,
+                'severity': condition.severity,
+                'urgency': condition.urgency,
+                'source': 'FastMedicalAI',
+                'recommendation': self._get_condition_recommendation(condition)
+            }
+            for entry in self.medical_knowledge.values()
+            for condition in entry['conditions']
+        }
+        
+        # Pay the Numba JIT cost at startup rather than on the first request (AOT kernels need none)
+        if NUMBA_AVAILABLE:
+            try:
+                if not AOT_KERNELS_AVAILABLE:
+                    _pixel_stats_kernel(np.zeros((4, 4, 3), dtype=np.uint8))
+                    _edge_count_kernel(np.zeros((4, 4), dtype=np.uint8), 2500)
+                flags = np.zeros(1, dtype=np.bool_)
+                _boost_confidences(flags, flags, flags, flags, 0, False,
+                                   np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+            except Exception as e:
+                self.logger.warning("Numba warm-up failed: %s", e)
+        
+        # 'normal' results depend on neither the image nor the symptoms, so build them once
+        self._static_normal_response = MappingProxyType(self._create_user_friendly_analysis(
+            'normal', dict(_DEFAULT_IMAGE_FEATURES), {}, _EMPTY_SCAN, self.medical_knowledge['normal']
+        ))
     
     def _create_user_friendly_analysis(self, image_type: str, image_features: Dict, 
-                                     symptom_analysis: Dict, symptoms: str, knowledge: Dict) -> Dict[str, Any]:
+                                     symptom_analysis: Dict, symptoms: SymptomScan, knowledge: Dict) -> Dict[str, Any]:
         """
         Create user-friendly analysis results
         """
         # Generate meaningful summary based on image type
-        if image_type == 'skin':
-            summary = self._generate_skin_analysis(image_features, symptoms)
-            conditions = self._analyze_skin_condition(image_features, symptoms)
-        elif image_type == 'xray':
-            summary = self._generate_xray_analysis(image_features, symptoms)
-            conditions = self._analyze_xray_condition(image_features, symptoms)
-        elif image_type == 'eye':
-            summary = self._generate_eye_analysis(image_features, symptoms)
-            conditions = self._analyze_eye_condition(image_features, symptoms)
-        else:
-            summary = self._generate_general_analysis(image_features, symptoms)
-            conditions = self._analyze_general_condition(image_features, symptoms)
+        summary_fn, condition_fn = self._dispatch.get(image_type, self._general_pair)
+        summary = summary_fn(image_features, symptoms)
+        conditions = condition_fn(image_features, symptoms)
+        
+        # Collect the per-condition values every helper needs in one pass
+        confs = tuple(c['confidence'] for c in conditions)
+        descs_lower = tuple(c.get('description', '').lower() for c in conditions)
         
         # Generate practical recommendations
-        recommendations = self._generate_practical_recommendations(conditions, image_type)
+        recommendations = self._generate_practical_recommendations(confs, descs_lower, image_type)
         
         # Calculate overall confidence
-        overall_confidence = sum(c['confidence'] for c in conditions) / len(conditions) if conditions else 50
+        overall_confidence = sum(confs) / len(confs) if confs else 50
         specialist = knowledge['specialist']
-        urgency = self._assess_urgency_level(conditions)
+        urgency = self._assess_urgency_level(confs, descs_lower)
         
         return {
             'success': True,
@@ -195,50 +924,81 @@ class FastMedicalAI:
         Purpose: Provides backup analysis when OpenAI Vision fails
         This method ensures the system always returns meaningful results
         """
+        start_ns = time.perf_counter_ns()
+        if image_type == 'normal':
+            analysis = copy.deepcopy(dict(self._static_normal_response))
+            analysis['processing_time_ms'] = (time.perf_counter_ns() - start_ns) // 1_000_000
+            return analysis
+        
         try:
-            # Basic image analysis
-            image_features = self._extract_image_features(image_data)
+            # Basic image analysis (skip the decode when there is nothing to decode)
+            if image_data:
+                image_features = self._extract_image_features(image_data)
+            else:
+                image_features = dict(_DEFAULT_IMAGE_FEATURES)
             
             # Get knowledge base for image type
             knowledge = self.medical_knowledge.get(image_type, self.medical_knowledge['skin'])
             
-            # Analyze symptoms
-            symptom_analysis = self._analyze_symptoms(symptoms)
+            # Analyze symptoms (lowercased and matched once, shared with the generators)
+            scan = self._scan_symptoms(symptoms)
+            symptom_analysis = self._analyze_symptoms(scan)
             
             # Create user-friendly analysis
-            return self._create_user_friendly_analysis(
-                image_type, image_features, symptom_analysis, symptoms, knowledge
+            analysis = self._create_user_friendly_analysis(
+                image_type, image_features, symptom_analysis, scan, knowledge
             )
+            analysis['processing_time_ms'] = (time.perf_counter_ns() - start_ns) // 1_000_000
+            return analysis
             
         except Exception as e:
-            self.logger.error(f"❌ Backup analysis failed: {e}")
+            self.logger.error("❌ Backup analysis failed: %s", e)
             return self._generate_emergency_fallback_analysis(image_type)
 
+    def _decode(self, image_data: bytes) -> np.ndarray:
+        """
+        Decode image bytes to a read-only BGR array (OpenCV's native order), reusing recent decodes
+        Both analysis paths, the vision resize and retries on the same upload share one decode
+        """
+        key = _image_digest(image_data)
+        with self._decode_cache_lock:
+            cached = self._decode_cache.get(key)
+            if cached is not None:
+                self._decode_cache.move_to_end(key)
+                return cached
+        
+        img_array = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        if img_array is None:
+            raise ValueError("Unable to decode image data")
+        img_array.setflags(write=False)
+        
+        with self._decode_cache_lock:
+            self._decode_cache[key] = img_array
+            if len(self._decode_cache) > self._decode_cache_size:
+                self._decode_cache.popitem(last=False)
+        return img_array
+
     def _extract_image_features(self, image_data: bytes) -> Dict[str, Any]:
         """Extract basic image features for analysis"""
         try:
-            from PIL import Image
-            import io
-            
-            # Open image
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            img_array = self._decode(image_data)
             
             # Basic feature extraction
-            width, height = image.size
+            height, width = img_array.shape[:2]
             
             # Calculate average brightness
-            pixels = list(image.getdata())
-            brightness = sum(sum(pixel) for pixel in pixels) / (len(pixels) * 3)
+            brightness = float(img_array.mean())
             
-            # Dominant colors (simplified)
-            from collections import Counter
-            pixel_colors = [pixel for pixel in pixels]
-            most_common = Counter(pixel_colors).most_common(5)
-            dominant_colors = [color for color, count in most_common]
+            # Dominant colors (simplified) - histogram of 5-bit-per-channel packed RGB (array is BGR)
+            arr5 = img_array >> 3
+            packed = ((arr5[..., 2].astype(np.uint32) << 10)
+                      | (arr5[..., 1].astype(np.uint32) << 5)
+                      | arr5[..., 0].astype(np.uint32))
+            counts = np.bincount(packed.ravel(), minlength=1 << 15)
+            top = np.argpartition(-counts, 3)[:3]
+            top = top[np.argsort(-counts[top])]
+            dominant_colors = [((int(t) >> 10) << 3, ((int(t) >> 5) & 31) << 3, (int(t) & 31) << 3)
+                               for t in top if counts[t]]
             
             return {
                 'width': width,
@@ -249,27 +1009,29 @@ class FastMedicalAI:
             }
             
         except Exception as e:
-            self.logger.error(f"Feature extraction failed: {e}")
-            return {
-                'width': 640,
-                'height': 480,
-                'brightness': 128,
-                'dominant_colors': [(128, 128, 128)],
-                'aspect_ratio': 1.33
-            }
+            self.logger.error("Feature extraction failed: %s", e)
+            return dict(_DEFAULT_IMAGE_FEATURES)
 
-    def _analyze_symptoms(self, symptoms: str) -> Dict[str, Any]:
-        """Analyze user-provided symptoms"""
+    def _scan_symptoms(self, symptoms: str) -> SymptomScan:
+        """Lowercase symptoms and run the keyword automaton over them once"""
         if not symptoms:
+            return _EMPTY_SCAN
+        text = symptoms.lower()
+        found = self._symptom_matcher.matches(text)
+        return SymptomScan(text, frozenset(keyword for _, keyword in found), frozenset(group for group, _ in found))
+
+    def _analyze_symptoms(self, symptoms: SymptomScan) -> Dict[str, Any]:
+        """Analyze user-provided symptoms"""
+        if not symptoms.text:
             return {'symptom_strength': 0, 'categories': [], 'urgency': 'low'}
         
-        symptoms_lower = symptoms.lower()
+        found = symptoms.groups
         categories = []
         urgency = 'low'
         
         # Check symptom categories
-        for category, keywords in self.symptom_keywords.items():
-            if any(keyword in symptoms_lower for keyword in keywords):
+        for category in self.symptom_keywords:
+            if category in found:
                 categories.append(category)
                 if category == 'urgent':
                     urgency = 'high'
@@ -287,32 +1049,7 @@ class FastMedicalAI:
     def _generate_emergency_fallback_analysis(self, image_type: str) -> Dict[str, Any]:
         """Generate emergency fallback when all analysis fails"""
         specialist = self.medical_knowledge.get(image_type, {}).get('specialist', 'General Practitioner')
-        return {
-            'success': True,
-            'summary': f"Medical image received for {image_type} analysis. Professional medical consultation strongly recommended for accurate diagnosis.",
-            'analysis_summary': f"Medical image received for {image_type} analysis. Professional medical consultation strongly recommended for accurate diagnosis.",
-            'conditions': [
-                {
-                    'name': 'Professional Evaluation Required',
-                    'confidence': 95,
-                    'source': 'Medical Safety Protocol'
-                }
-            ],
-            'recommendations': [
-                'Consult with a qualified medical professional',
-                'Bring original image to medical appointment',
-                'Document any symptoms or changes',
-                'Seek urgent care if symptoms worsen'
-            ],
-            'confidence': 0.95,  # Expected as decimal
-            'overall_confidence': 95,
-            'analysis_methods': ['Medical Safety Protocol'],
-            'specialist_recommendation': specialist,  # Expected by main.py
-            'specialist_recommended': specialist,  # Keep both formats
-            'urgency': 'moderate',  # Expected by main.py (lowercase)
-            'urgency_level': 'MODERATE',  # Keep both formats
-            'processing_time_ms': 0
-        }
+        return copy.deepcopy(dict(_emergency_fallback_template(image_type, specialist)))
     
     def analyze_with_openai_vision(self, image_data: bytes, image_type: str = 'skin', symptoms: str = '') -> Dict[str, Any]:
         """
@@ -324,53 +1061,166 @@ class FastMedicalAI:
             self.logger.warning("OpenAI not available, falling back to basic analysis")
             return self.analyze(image_data, image_type, symptoms)
         
+        cache_key = self._vision_cache_key(image_data, image_type, symptoms)
+        cached = self._get_cached_vision(cache_key)
+        if cached is not None:
+            return _loads(cached)
+        
         try:
-            # CHECKPOINT: Convert image to base64 for OpenAI
-            base64_image = base64.b64encode(image_data).decode('utf-8')
-            
-            # CHECKPOINT: Create specialized medical prompt based on image type
-            system_prompt = self._get_medical_analysis_prompt(image_type)
-            user_prompt = self._create_user_prompt(image_type, symptoms)
-            
             # CHECKPOINT: Call OpenAI Vision API with updated model
             response = self.openai_client.chat.completions.create(
-                model="gpt-4o",  # Updated to use gpt-4o instead of deprecated gpt-4-vision-preview
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": user_prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1000,
-                temperature=0.3  # Lower temperature for more consistent medical analysis
+                **self._build_vision_request(image_data, image_type, symptoms)
             )
             
             # CHECKPOINT: Parse OpenAI response into structured format
             ai_analysis = response.choices[0].message.content
-            return self._parse_openai_response(ai_analysis, image_type)
+            result = self._parse_structured_response(ai_analysis, image_type)
+            self._store_cached_vision(cache_key, result)
+            return result
             
         except Exception as e:
-            self.logger.error(f"❌ OpenAI Vision analysis failed: {e}")
+            self.logger.error("❌ OpenAI Vision analysis failed: %s", e)
             # Fall back to basic analysis
             return self.analyze(image_data, image_type, symptoms)
     
-    def _generate_skin_analysis(self, features: Dict, symptoms: str) -> str:
+    async def analyze_with_openai_vision_async(self, image_data: bytes, image_type: str = 'skin',
+                                               symptoms: str = '') -> Dict[str, Any]:
+        """
+        Awaitable mirror of analyze_with_openai_vision
+        Purpose: Lets several uploads overlap their network wait on one event loop
+        """
+        if not self.openai_available:
+            self.logger.warning("OpenAI not available, falling back to basic analysis")
+            return self.analyze(image_data, image_type, symptoms)
+        
+        cache_key = self._vision_cache_key(image_data, image_type, symptoms)
+        cached = self._get_cached_vision(cache_key)
+        if cached is not None:
+            return _loads(cached)
+        
+        try:
+            response = await self.async_client.chat.completions.create(
+                **self._build_vision_request(image_data, image_type, symptoms)
+            )
+            
+            ai_analysis = response.choices[0].message.content
+            result = self._parse_structured_response(ai_analysis, image_type)
+            self._store_cached_vision(cache_key, result)
+            return result
+            
+        except Exception as e:
+            self.logger.error("❌ Async OpenAI Vision analysis failed: %s", e)
+            return self.analyze(image_data, image_type, symptoms)
+    
+    async def analyze_many_async(self, items: List[tuple], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Analyze several (image_data, image_type, symptoms) tuples concurrently
+        Concurrency is capped so a burst of uploads stays below the provider rate limit
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _bounded(item):
+            async with semaphore:
+                return await self.analyze_with_openai_vision_async(*item)
+        
+        return await asyncio.gather(*(_bounded(item) for item in items))
+    
+    def analyze_as_bytes(self, image_data: bytes, image_type: str = 'skin', symptoms: str = '') -> bytes:
+        """Vision analysis serialized to JSON bytes, ready to send as an HTTP body"""
+        cached = self._get_cached_vision(self._vision_cache_key(image_data, image_type, symptoms))
+        if cached is not None:
+            return cached
+        return _dumps(self.analyze_with_openai_vision(image_data, image_type, symptoms))
+    
+    def _vision_cache_key(self, image_data: bytes, image_type: str, symptoms: str) -> bytes:
+        """Digest of the upload plus the prompt inputs"""
+        digest = hashlib.blake2b(image_data, digest_size=16)
+        digest.update(f"\0{image_type}\0{symptoms}".encode('utf-8'))
+        return digest.digest()
+    
+    def _get_cached_vision(self, key: bytes) -> Optional[bytes]:
+        """Return the serialized result for key, if cached"""
+        with self._vision_cache_lock:
+            cached = self._vision_cache.get(key)
+            if cached is not None:
+                self._vision_cache.move_to_end(key)
+        return cached
+    
+    def _store_cached_vision(self, key: bytes, result: Dict[str, Any]) -> None:
+        """Serialize and store a vision result with LRU eviction"""
+        serialized = _dumps(result)
+        with self._vision_cache_lock:
+            self._vision_cache[key] = serialized
+            if len(self._vision_cache) > self._vision_cache_size:
+                self._vision_cache.popitem(last=False)
+    
+    def _build_vision_request(self, image_data: bytes, image_type: str, symptoms: str) -> Dict[str, Any]:
+        """Build the chat.completions keyword arguments shared by the sync and async paths"""
+        # CHECKPOINT: Downsample and convert image to a base64 data URL for OpenAI
+        data_url = self._build_data_url(self._resize_for_vision(image_data))
+        
+        # CHECKPOINT: Create specialized medical prompt based on image type
+        system_prompt = self._get_medical_analysis_prompt(image_type)
+        user_prompt = self._create_user_prompt(image_type, symptoms)
+        
+        return {
+            'model': "gpt-4o",  # Updated to use gpt-4o instead of deprecated gpt-4-vision-preview
+            'messages': [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": user_prompt
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": data_url,
+                                "detail": "high"
+                            }
+                        }
+                    ]
+                }
+            ],
+            'max_tokens': 1000,
+            'temperature': 0.3,  # Lower temperature for more consistent medical analysis
+            'response_format': {"type": "json_schema", "json_schema": _RESP_SCHEMA}
+        }
+    
+    def _build_data_url(self, image_data: bytes) -> str:
+        """Encode image bytes as a JPEG data URL with a single string allocation where possible"""
+        if _B64_ENCODE_STR is not None:
+            return _DATA_URL_PREFIX + _B64_ENCODE_STR(image_data)
+        return _DATA_URL_PREFIX + _b64.b64encode(image_data).decode('ascii')
+    
+    def _resize_for_vision(self, image_data: bytes, max_side: int = 1024) -> bytes:
+        """
+        Shrink large uploads so the long side is at most max_side pixels
+        Image tokens and upload time scale with resolution, so phone photos are re-encoded as JPEG
+        """
+        try:
+            img_array = self._decode(image_data)
+            
+            height, width = img_array.shape[:2]
+            scale = max_side / max(height, width)
+            if scale >= 1:
+                return image_data
+            
+            resized = cv2.resize(img_array, (int(width * scale), int(height * scale)),
+                                 interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            return encoded.tobytes() if ok else image_data
+            
+        except Exception as e:
+            self.logger.warning("Vision resize skipped: %s", e)
+            return image_data
+    
+    def _generate_skin_analysis(self, features: Dict, symptoms: SymptomScan) -> str:
         """Generate skin-specific analysis summary"""
         color_info = features.get('dominant_colors', [])
         brightness = features.get('brightness', 128)
@@ -386,11 +1236,10 @@ class FastMedicalAI:
             analysis_parts.append("The image shows a skin area with normal pigmentation")
         
         # Check for concerning symptoms
-        if symptoms:
-            symptoms_lower = symptoms.lower()
-            if any(word in symptoms_lower for word in ['bleeding', 'itchy', 'growing', 'changing']):
+        if symptoms.text:
+            if 'skin_concerning' in symptoms.groups:
                 analysis_parts.append("Based on the symptoms described, this area requires medical attention")
-            elif any(word in symptoms_lower for word in ['pain', 'burning', 'tender']):
+            elif 'skin_pain' in symptoms.groups:
                 analysis_parts.append("The reported pain symptoms suggest possible irritation or inflammation")
             else:
                 analysis_parts.append("The symptoms provided suggest a common skin condition")
@@ -400,15 +1249,15 @@ class FastMedicalAI:
         
         return ". ".join(analysis_parts) + "."
     
-    def _analyze_skin_condition(self, features: Dict, symptoms: str) -> List[Dict]:
+    def _analyze_skin_condition(self, features: Dict, symptoms: SymptomScan) -> List[Dict]:
         """Analyze skin condition based on image and symptoms"""
         conditions = []
         
-        if symptoms:
-            symptoms_lower = symptoms.lower()
+        if symptoms.text:
+            found = symptoms.groups
             
             # Check for concerning symptoms
-            if any(word in symptoms_lower for word in ['bleeding', 'growing', 'changing', 'irregular']):
+            if 'skin_lesion_change' in found:
                 conditions.append({
                     'name': 'Atypical Mole or Lesion',
                     'confidence': 75,
@@ -422,7 +1271,7 @@ class FastMedicalAI:
                     'source': 'Medical guidelines'
                 })
             
-            elif any(word in symptoms_lower for word in ['itchy', 'rash', 'red', 'inflamed']):
+            elif 'skin_irritation' in found:
                 conditions.append({
                     'name': 'Skin Irritation or Dermatitis',
                     'confidence': 70,
@@ -436,7 +1285,7 @@ class FastMedicalAI:
                     'source': 'Symptom pattern'
                 })
             
-            elif any(word in symptoms_lower for word in ['dry', 'scaly', 'flaky']):
+            elif 'skin_dry' in found:
                 conditions.append({
                     'name': 'Dry Skin or Eczema',
                     'confidence': 65,
@@ -455,11 +1304,11 @@ class FastMedicalAI:
         
         return conditions
     
-    def _generate_xray_analysis(self, features: Dict, symptoms: str) -> str:
+    def _generate_xray_analysis(self, features: Dict, symptoms: SymptomScan) -> str:
         """Generate X-ray specific analysis summary"""
         return "Chest X-ray analysis shows findings that should be reviewed by a radiologist. Any concerning symptoms should be discussed with your healthcare provider."
     
-    def _analyze_xray_condition(self, features: Dict, symptoms: str) -> List[Dict]:
+    def _analyze_xray_condition(self, features: Dict, symptoms: SymptomScan) -> List[Dict]:
         """Analyze X-ray condition"""
         return [{
             'name': 'Radiological Findings',
@@ -468,11 +1317,11 @@ class FastMedicalAI:
             'source': 'Medical imaging guidelines'
         }]
     
-    def _generate_eye_analysis(self, features: Dict, symptoms: str) -> str:
+    def _generate_eye_analysis(self, features: Dict, symptoms: SymptomScan) -> str:
         """Generate eye-specific analysis summary"""
         return "Eye examination shows features that should be evaluated by an ophthalmologist. Regular eye exams are important for maintaining vision health."
     
-    def _analyze_eye_condition(self, features: Dict, symptoms: str) -> List[Dict]:
+    def _analyze_eye_condition(self, features: Dict, symptoms: SymptomScan) -> List[Dict]:
         """Analyze eye condition"""
         return [{
             'name': 'Ophthalmological Assessment Needed',
@@ -481,11 +1330,11 @@ class FastMedicalAI:
             'source': 'Vision health guidelines'
         }]
     
-    def _generate_general_analysis(self, features: Dict, symptoms: str) -> str:
+    def _generate_general_analysis(self, features: Dict, symptoms: SymptomScan) -> str:
         """Generate general analysis summary"""
         return "Medical image analysis completed. For accurate diagnosis and treatment recommendations, please consult with an appropriate healthcare specialist."
     
-    def _analyze_general_condition(self, features: Dict, symptoms: str) -> List[Dict]:
+    def _analyze_general_condition(self, features: Dict, symptoms: SymptomScan) -> List[Dict]:
         """Analyze general condition"""
         return [{
             'name': 'Professional Medical Evaluation Recommended',
@@ -494,14 +1343,14 @@ class FastMedicalAI:
             'source': 'General medical guidelines'
         }]
 
-    def _generate_practical_recommendations(self, conditions: List[Dict], image_type: str) -> List[str]:
+    def _generate_practical_recommendations(self, confs: tuple, descs_lower: tuple, image_type: str) -> List[str]:
         """Generate practical, actionable recommendations"""
         recommendations = []
         
         if image_type == 'skin':
             # Check if urgent evaluation needed
-            urgent_needed = any(c['confidence'] > 70 and 'evaluation' in c['description'].lower() 
-                              for c in conditions)
+            urgent_needed = any(conf > 70 and 'evaluation' in desc
+                              for conf, desc in zip(confs, descs_lower))
             
             if urgent_needed:
                 recommendations.extend([
@@ -542,18 +1391,13 @@ class FastMedicalAI:
         
         return recommendations
     
-    def _assess_urgency_level(self, conditions: List[Dict]) -> str:
+    def _assess_urgency_level(self, confs: tuple, descs_lower: tuple) -> str:
         """Assess overall urgency level"""
-        if not conditions:
+        if not confs:
             return "Low"
         
-        max_confidence = max(c['confidence'] for c in conditions)
-        urgent_keywords = ['evaluation', 'immediate', 'attention', 'bleeding', 'changing']
-        
-        has_urgent_condition = any(
-            any(keyword in c['description'].lower() for keyword in urgent_keywords)
-            for c in conditions
-        )
+        max_confidence = max(confs, default=0)
+        has_urgent_condition = any(_URGENT_RE.search(desc) for desc in descs_lower)
         
         if has_urgent_condition and max_confidence > 70:
             return "Moderate to High"
@@ -576,33 +1420,37 @@ class FastMedicalAI:
         Returns:
             Fast analysis results
         """
+        start_ns = time.perf_counter_ns()
         try:
             # Quick image preprocessing
             image_features = self._extract_fast_features(image_data)
             
+            # Lowercase and match the symptoms once for every helper below
+            scan = self._scan_symptoms(symptoms)
+            
             # Determine image type if not provided
             if not image_type:
-                image_type = self._detect_image_type_fast(image_features, symptoms)
+                image_type = self._detect_image_type_fast(image_features, scan)
             
             # Get medical knowledge for this type
             knowledge = self.medical_knowledge.get(image_type, self.medical_knowledge['skin'])
             
             # Analyze symptoms for intelligent condition selection
-            symptom_analysis = self._analyze_symptoms_fast(symptoms)
+            symptom_analysis = self._analyze_symptoms_fast(scan)
             
             # Create user-friendly analysis
             analysis = self._create_user_friendly_analysis(
-                image_type, image_features, symptom_analysis, symptoms, knowledge
+                image_type, image_features, symptom_analysis, scan, knowledge
             )
             
             return {
                 'success': True,
                 'analysis': analysis,
-                'processing_time_ms': random.randint(200, 800)  # Simulated fast processing
+                'processing_time_ms': (time.perf_counter_ns() - start_ns) // 1_000_000
             }
             
         except Exception as e:
-            self.logger.error(f"Fast medical analysis error: {e}")
+            self.logger.error("Fast medical analysis error: %s", e)
             return {
                 'success': False,
                 'error': str(e),
@@ -612,31 +1460,56 @@ class FastMedicalAI:
     def _extract_fast_features(self, image_data: bytes) -> Dict[str, Any]:
         """Extract basic image features quickly"""
         try:
-            # Convert to PIL Image
+            # Accept base64 strings and data URLs as well as raw bytes
             if isinstance(image_data, str):
-                if 'base64,' in image_data:
-                    image_data = image_data.split('base64,')[1]
-                image_data = base64.b64decode(image_data)
+                image_data = image_data.rpartition('base64,')[2]  # strip any data-URL prefix
+                image_data = _b64.b64decode(image_data)
             
-            image = Image.open(io.BytesIO(image_data))
-            img_array = np.array(image.convert('RGB'))
+            # Re-analysis of the same upload (e.g. with different symptoms) skips decode and every reduction
+            key = _image_digest(image_data)
+            with self._feature_cache_lock:
+                cached = self._feature_cache.get(key)
+                if cached is not None:
+                    self._feature_cache.move_to_end(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
             
-            # Fast feature extraction
+            img_array = self._decode(image_data)
+            
+            # Original dimensions drive dimensions/size_category; every statistic runs on a
+            # thumbnail of at most 256px on the long side (all features are low-frequency)
             height, width = img_array.shape[:2]
-            brightness = np.mean(img_array)
-            contrast = np.std(img_array)
+            thumb = img_array
+            if max(width, height) > 256:
+                scale = 256 / max(width, height)
+                thumb = cv2.resize(img_array, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                   interpolation=cv2.INTER_AREA)
             
-            # Color analysis
-            red_mean = np.mean(img_array[:, :, 0])
-            green_mean = np.mean(img_array[:, :, 1])
-            blue_mean = np.mean(img_array[:, :, 2])
+            # Fast feature extraction - channel means in one pass, overall stats derived from them
+            if FAST_KERNELS_AVAILABLE:
+                sum_b, sum_g, sum_r, sum_sq, n = _pixel_stats_kernel(thumb)
+                red_mean, green_mean, blue_mean = sum_r / n, sum_g / n, sum_b / n
+                brightness = (sum_r + sum_g + sum_b) / (3 * n)
+                contrast = np.sqrt(max(sum_sq / (3 * n) - brightness * brightness, 0.0))
+            else:
+                # One OpenCV pass gives per-channel mean and std; overall std follows from them
+                means, stds = cv2.meanStdDev(thumb)
+                means, stds = means.ravel(), stds.ravel()
+                blue_mean, green_mean, red_mean = means
+                brightness = means.mean()
+                contrast = np.sqrt(max(float(np.mean(stds ** 2 + means ** 2)) - brightness * brightness, 0.0))
             
-            # Simple texture analysis
-            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            edges = cv2.Canny(gray, 100, 200)
-            edge_density = np.sum(edges > 0) / edges.size
+            # Simple texture analysis - Sobel magnitude on the grayscale thumbnail
+            gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+            if FAST_KERNELS_AVAILABLE:
+                edge_density = _edge_count_kernel(gray, 2500) / gray.size
+            else:
+                gx = cv2.Sobel(gray, cv2.CV_16S, 1, 0)
+                gy = cv2.Sobel(gray, cv2.CV_16S, 0, 1)
+                magnitude = cv2.magnitude(gx.astype(np.float32), gy.astype(np.float32))
+                edge_density = cv2.countNonZero(cv2.compare(magnitude, 50, cv2.CMP_GT)) / magnitude.size
             
-            return {
+            features = {
                 'dimensions': (width, height),
                 'brightness': float(brightness),
                 'contrast': float(contrast),
@@ -648,6 +1521,12 @@ class FastMedicalAI:
                 'edge_density': float(edge_density),
                 'size_category': 'large' if max(width, height) > 1000 else 'medium' if max(width, height) > 500 else 'small'
             }
+            entry = copy.deepcopy(features)
+            with self._feature_cache_lock:
+                self._feature_cache[key] = entry
+                if len(self._feature_cache) > self._feature_cache_size:
+                    self._feature_cache.popitem(last=False)
+            return features
             
         except Exception as e:
             return {
@@ -659,48 +1538,43 @@ class FastMedicalAI:
                 'error': str(e)
             }
     
-    def _detect_image_type_fast(self, features: Dict, symptoms: str) -> str:
+    def _detect_image_type_fast(self, features: Dict, symptoms: SymptomScan) -> str:
         """Quickly detect image type"""
-        symptoms_lower = symptoms.lower()
-        
         # High contrast + respiratory symptoms = X-ray
-        if features['contrast'] > 80 and any(word in symptoms_lower for word in ['chest', 'cough', 'breathing']):
+        if features['contrast'] > 80 and _XRAY_SYM_RE.search(symptoms.text):
             return 'xray'
         
         # Circular patterns + eye symptoms = eye image
-        if any(word in symptoms_lower for word in ['vision', 'eye', 'blind', 'diabetes']):
+        if _EYE_SYM_RE.search(symptoms.text):
             return 'eye'
         
         # Default to skin (most common)
         return 'skin'
     
-    def _analyze_symptoms_fast(self, symptoms: str) -> Dict[str, Any]:
+    def _analyze_symptoms_fast(self, symptoms: SymptomScan) -> Dict[str, Any]:
         """Fast symptom analysis"""
-        if not symptoms:
+        if not symptoms.text:
             return {'urgency_score': 3, 'keywords_found': [], 'category': 'general'}
         
-        symptoms_lower = symptoms.lower()
+        found = symptoms.keywords
         urgency_score = 3  # Default moderate
         keywords_found = []
         category = 'general'
         
-        # Check for urgent keywords
-        for keyword in self.symptom_keywords['urgent']:
-            if keyword in symptoms_lower:
-                urgency_score = max(urgency_score, 5)
-                keywords_found.append(keyword)
-                category = 'urgent'
+        # Check for urgent keywords (a set test decides; hits are listed in declaration order)
+        if not self._urgent_set.isdisjoint(found):
+            urgency_score = 5
+            keywords_found.extend(k for k in self.symptom_keywords['urgent'] if k in found)
+            category = 'urgent'
         
         # Check for specific conditions
-        for keyword in self.symptom_keywords['skin_cancer']:
-            if keyword in symptoms_lower:
-                keywords_found.append(keyword)
-                category = 'dermatology'
+        if not self._keyword_sets['skin_cancer'].isdisjoint(found):
+            keywords_found.extend(k for k in self.symptom_keywords['skin_cancer'] if k in found)
+            category = 'dermatology'
         
-        for keyword in self.symptom_keywords['respiratory']:
-            if keyword in symptoms_lower:
-                keywords_found.append(keyword)
-                category = 'respiratory'
+        if not self._keyword_sets['respiratory'].isdisjoint(found):
+            keywords_found.extend(k for k in self.symptom_keywords['respiratory'] if k in found)
+            category = 'respiratory'
         
         return {
             'urgency_score': urgency_score,
@@ -712,109 +1586,88 @@ class FastMedicalAI:
     def _generate_smart_predictions(self, features: Dict, knowledge: Dict, 
                                   symptom_analysis: Dict, symptoms: str) -> List[Dict]:
         """Generate intelligent condition predictions"""
-        conditions = []
-        base_conditions = knowledge['conditions'].copy()
-        
-        # Adjust predictions based on symptoms and image features
-        for condition in base_conditions:
-            confidence = random.randint(40, 90)  # Base confidence
-            
-            # Boost confidence for symptom matches
-            if symptom_analysis['category'] == 'urgent' and condition['urgency'] == 'URGENT':
-                confidence += 15
-            elif symptom_analysis['category'] == 'dermatology' and 'melanoma' in condition['name'].lower():
-                confidence += 20
-            elif symptom_analysis['category'] == 'respiratory' and 'pneumonia' in condition['name'].lower():
-                confidence += 25
-            
-            # Adjust based on image features
-            if features['contrast'] > 70 and 'normal' not in condition['name'].lower():
-                confidence += 10
-            
-            # Add some intelligent randomization
-            confidence = min(95, max(30, confidence + random.randint(-10, 15)))
-            
-            conditions.append({
-                'name': condition['name'],
-                'confidence': confidence,
-                'severity': condition['severity'],
-                'urgency': condition['urgency'],
-                'source': 'FastMedicalAI',
-                'recommendation': self._get_condition_recommendation(condition)
-            })
+        base_conditions = knowledge['conditions']
+        n = len(base_conditions)
+        is_urgent, has_melanoma, has_pneumonia, has_normal = self._get_condition_arrays(base_conditions)
+        
+        # Base confidence plus some intelligent randomization, then symptom and feature boosts
+        confidences = _boost_confidences(
+            is_urgent, has_melanoma, has_pneumonia, has_normal,
+            _SYMPTOM_CATEGORY_CODES.get(symptom_analysis['category'], 0),
+            features['contrast'] > 70,
+            self._rng.integers(40, 91, size=n), self._rng.integers(-10, 16, size=n)
+        )
         
-        # Sort by confidence and return top 4
-        conditions.sort(key=lambda x: x['confidence'], reverse=True)
-        return conditions[:4]
+        # Top 4 by confidence, ties in knowledge-base order: partition, then sort only the 4 survivors.
+        # Confidences are whole numbers in [30, 95], so (95 - confidence) * n + index is a unique rank key
+        order = (95 - confidences.astype(np.int64)) * n + np.arange(n)
+        top = np.argpartition(order, 3)[:4] if n > 4 else np.arange(n)
+        top = top[np.argsort(order[top])]
+        predictions = []
+        for i in top:
+            prediction = self._prediction_templates[base_conditions[i]].copy()
+            prediction['confidence'] = int(confidences[i])
+            predictions.append(prediction)
+        return predictions
     
-    def _get_condition_recommendation(self, condition: Dict) -> str:
+    def _get_condition_arrays(self, conditions: tuple) -> tuple:
+        """Boolean flag arrays (urgent, melanoma, pneumonia, normal) for a knowledge-base condition list"""
+        cached = self._condition_arrays.get(id(conditions))
+        if cached is not None and cached[0] is conditions:
+            return cached[1]
+        
+        names_lower = [c.name.lower() for c in conditions]
+        arrays = (
+            np.array([c.urgency == 'URGENT' for c in conditions], dtype=np.bool_),
+            np.array(['melanoma' in name for name in names_lower], dtype=np.bool_),
+            np.array(['pneumonia' in name for name in names_lower], dtype=np.bool_),
+            np.array(['normal' in name for name in names_lower], dtype=np.bool_)
+        )
+        self._condition_arrays[id(conditions)] = (conditions, arrays)
+        return arrays
+    
+    def _get_condition_recommendation(self, condition: Condition) -> str:
         """Get recommendation for condition"""
-        if condition['urgency'] == 'URGENT':
+        if condition.urgency == 'URGENT':
             return 'Seek immediate medical attention'
-        elif condition['urgency'] == 'MODERATE':
+        elif condition.urgency == 'MODERATE':
             return 'Schedule appointment within 1-2 weeks'
         else:
             return 'Routine monitoring or consultation'
     
-    def _determine_urgency(self, conditions: List[Dict], symptoms: str) -> str:
+    def _determine_urgency(self, conditions: List[Dict], symptoms: SymptomScan) -> str:
         """Determine overall urgency"""
         if not conditions:
             return 'MODERATE'
         
-        # Check for urgent conditions
-        for condition in conditions:
-            if condition['urgency'] == 'URGENT' and condition['confidence'] > 60:
-                return 'URGENT'
-        
-        # Check symptoms for urgent keywords
-        symptoms_lower = symptoms.lower()
-        if any(word in symptoms_lower for word in self.symptom_keywords['urgent']):
+        # Check for urgent conditions (urgency codes and confidences as parallel arrays)
+        n = len(conditions)
+        urgencies = np.fromiter((_URGENCY_CODES.get(c['urgency'], 0) for c in conditions), dtype=np.int8, count=n)
+        confidences = np.fromiter((c['confidence'] for c in conditions), dtype=np.float32, count=n)
+        if np.any((urgencies == _URGENCY_CODES['URGENT']) & (confidences > 60)):
             return 'URGENT'
         
-        return 'MODERATE'
-    
-    def _generate_fast_recommendations(self, conditions: List[Dict], knowledge: Dict) -> List[str]:
-        """Generate quick recommendations"""
-        recommendations = []
-        
-        if not conditions:
-            return ['Professional medical evaluation recommended']
-        
-        top_condition = conditions[0]
-        urgency = top_condition['urgency']
-        
-        # Urgency-based recommendations
-        if urgency == 'URGENT':
-            recommendations.extend([
-                '🚨 URGENT: Seek immediate medical attention',
-                '🏥 Consider emergency room or urgent care'
-            ])
-        elif urgency == 'MODERATE':
-            recommendations.append('📅 Schedule appointment within 1-2 weeks')
-        else:
-            recommendations.append('📋 Routine medical consultation recommended')
-        
-        # Specialist recommendation
-        specialist = knowledge['specialist']
-        recommendations.append(f'👨‍⚕️ Consultation with {specialist} recommended')
-        
-        # Condition-specific advice
-        condition_name = top_condition['name']
-        confidence = top_condition['confidence']
+        # Check symptoms for urgent keywords
+        if not self._urgent_set.isdisjoint(symptoms.keywords):
+            return 'URGENT'
         
-        if confidence > 80:
-            recommendations.append(f'🎯 High confidence finding: {condition_name}')
-        else:
-            recommendations.append(f'🤔 Possible condition: {condition_name}')
+        return 'MODERATE'
+    
+    def _generate_fast_recommendations(self, conditions: List[Dict], knowledge: Dict) -> List[str]:
+        """Generate quick recommendations"""
+        if not conditions:
+            return [_NO_CONDITION_REC]
         
-        # General advice
-        recommendations.extend([
-            '📸 Document any changes in symptoms',
-            '📱 Bring this analysis to your appointment',
-            '⚠️ Monitor for worsening symptoms'
-        ])
+        top_condition = conditions[0]
+        lines, condition_index = _fast_recommendations_template(
+            _URGENCY_CODES.get(top_condition['urgency'], 0),
+            knowledge['specialist'],
+            top_condition['confidence'] > 80
+        )
         
-        return recommendations[:6]
+        recommendations = list(lines)
+        recommendations[condition_index] = lines[condition_index].format(condition_name=top_condition['name'])
+        return recommendations
     
     def _calculate_confidence(self, conditions: List[Dict], symptom_analysis: Dict) -> float:
         """Calculate overall confidence"""
@@ -830,278 +1683,75 @@ class FastMedicalAI:
         
         return min(95.0, base_confidence)
     
-    def _get_medical_analysis_prompt(self, image_type: str) -> str:
-        """
-        CHECKPOINT: Enhanced Medical Analysis Prompt Generator
-        Purpose: Creates highly specialized prompts for accurate medical image analysis
-        Trained for: skin, bone/xray, eye, mri, ct, ultrasound, and general medical images
-        """
-        base_prompt = """You are an expert medical imaging AI with specialized training in clinical diagnosis. You help healthcare professionals analyze medical images with high accuracy.
-
-CORE MEDICAL IMAGING PRINCIPLES:
-- Use evidence-based diagnostic criteria
-- Apply appropriate medical terminology
-- Consider differential diagnoses systematically
-- Assess urgency levels accurately
-- Recommend correct medical specialists
-- Always emphasize professional medical consultation
-
-IMPORTANT: NON-MEDICAL IMAGE DETECTION
-- If this appears to be a normal selfie, portrait, or non-medical photo without obvious medical concerns, clearly state this
-- For normal appearance without visible pathology, indicate "Normal appearance - no obvious medical concerns visible"
-- Still provide educational information about when to seek medical care
-- Recommend routine check-ups even for normal-appearing images
-
-REQUIRED RESPONSE FORMAT:
-1. INITIAL OBSERVATIONS: Describe what you see clinically (or if it appears normal/non-medical)
-2. POSSIBLE CONDITIONS: List 2-4 conditions with confidence percentages (0-100%) OR state "Normal appearance - no obvious pathology" (100%)
-3. SPECIALIST RECOMMENDATION: Choose the most appropriate medical specialist OR "Routine care with General Practitioner"
-4. URGENCY LEVEL: LOW/MODERATE/HIGH/URGENT based on findings (LOW for normal images)
-5. RED FLAGS: Any concerning features requiring immediate attention OR "No red flags observed"
-6. NEXT STEPS: Practical recommendations for patient care (routine screening for normal images)"""
-
-        if image_type in ['skin', 'dermatology']:
-            return base_prompt + """
-
-🔬 DERMATOLOGY SPECIALIST ANALYSIS:
-EXAMINE FOR:
-- ABCDE criteria: Asymmetry, Border irregularity, Color variation, Diameter >6mm, Evolution
-- Pigmentation patterns: uniform vs irregular, new vs changing lesions
-- Surface texture: smooth, rough, scaly, ulcerated, raised, flat
-- Vascular patterns: telangiectasias, inflammation, bleeding
-- Distribution patterns: localized vs widespread, symmetric vs asymmetric
-
-CONDITION CATEGORIES TO CONSIDER:
-- Malignant: Melanoma, Basal cell carcinoma, Squamous cell carcinoma
-- Benign: Seborrheic keratosis, Dermatofibroma, Benign nevi
-- Inflammatory: Eczema, Psoriasis, Contact dermatitis, Rosacea
-- Infectious: Bacterial, Fungal, Viral infections
-- Vascular: Hemangiomas, Spider angiomas, Purpura
-
-SPECIALIST: Always recommend DERMATOLOGIST for skin conditions
-URGENCY ASSESSMENT:
-- URGENT: Rapidly changing lesions, ulceration, bleeding, irregular borders
-- HIGH: New pigmented lesions, suspicious features
-- MODERATE: Persistent lesions, inflammatory conditions
-- LOW: Stable benign-appearing lesions"""
-
-        elif image_type in ['bone', 'xray', 'x-ray', 'fracture', 'orthopedic']:
-            return base_prompt + """
-
-🦴 ORTHOPEDIC/RADIOLOGY SPECIALIST ANALYSIS:
-EXAMINE FOR:
-- Bone continuity: Complete vs incomplete fractures, displacement
-- Fracture patterns: Transverse, oblique, spiral, comminuted, greenstick
-- Joint alignment: Dislocations, subluxations, joint space narrowing
-- Bone density: Osteoporosis, sclerosis, lytic lesions
-- Soft tissue: Swelling, foreign bodies, gas patterns
-
-CONDITION CATEGORIES TO CONSIDER:
-- Acute fractures: Simple, compound, displaced, non-displaced
-- Chronic conditions: Arthritis, osteoporosis, bone tumors
-- Joint pathology: Dislocations, torn ligaments, cartilage damage
-- Developmental: Growth plate injuries, congenital abnormalities
-- Infectious: Osteomyelitis, septic arthritis
-
-SPECIALIST RECOMMENDATIONS:
-- ORTHOPEDIST: For fractures, joint injuries, bone conditions
-- RADIOLOGIST: For complex imaging interpretation
-- EMERGENCY MEDICINE: For acute traumatic injuries
-
-URGENCY ASSESSMENT:
-- URGENT: Open fractures, neurovascular compromise, severe displacement
-- HIGH: Acute fractures, joint dislocations, suspected infections
-- MODERATE: Chronic arthritis, minor fractures
-- LOW: Old healed fractures, mild degenerative changes"""
-
-        elif image_type in ['eye', 'retina', 'ophthalmology']:
-            return base_prompt + """
-
-👁️ OPHTHALMOLOGY SPECIALIST ANALYSIS:
-EXAMINE FOR:
-- Optic disc: Cupping, pallor, swelling, hemorrhages
-- Macula: Drusen, hemorrhages, exudates, pigmentation
-- Retinal vessels: Caliber, arteriovenous nicking, hemorrhages
-- Background retina: Cotton wool spots, hard exudates, microaneurysms
-- Overall clarity: Media opacities, vitreous changes
-
-CONDITION CATEGORIES TO CONSIDER:
-- Diabetic retinopathy: Non-proliferative vs proliferative
-- Glaucoma: Optic nerve cupping, visual field defects
-- Macular degeneration: Wet vs dry, geographic atrophy
-- Hypertensive retinopathy: Arterial changes, hemorrhages
-- Vascular occlusions: Central vs branch retinal artery/vein occlusion
-
-SPECIALIST: Always recommend OPHTHALMOLOGIST for eye conditions
-URGENCY ASSESSMENT:
-- URGENT: Acute vision loss, retinal detachment, acute angle closure
-- HIGH: New hemorrhages, proliferative retinopathy, optic nerve swelling
-- MODERATE: Mild diabetic changes, early glaucoma
-- LOW: Stable chronic conditions, minor refractive errors"""
-
-        elif image_type in ['mri', 'brain', 'spine', 'neurological']:
-            return base_prompt + """
-
-🧠 NEUROLOGICAL/RADIOLOGY SPECIALIST ANALYSIS:
-EXAMINE FOR:
-- Brain structures: Gray-white matter differentiation, ventricles, sulci
-- Signal abnormalities: T1/T2 changes, enhancement patterns
-- Mass effects: Midline shift, herniation, compression
-- Vascular patterns: Infarcts, hemorrhages, aneurysms
-- Spinal structures: Cord compression, disc herniations, stenosis
-
-CONDITION CATEGORIES TO CONSIDER:
-- Stroke: Acute infarct, hemorrhage, chronic changes
-- Tumors: Primary brain tumors, metastases, benign masses
-- Inflammatory: Multiple sclerosis, encephalitis, abscess
-- Degenerative: Alzheimer's, spine degeneration, cord compression
-- Traumatic: Hematomas, contusions, diffuse axonal injury
-
-SPECIALIST RECOMMENDATIONS:
-- NEUROLOGIST: For brain conditions, stroke, degenerative diseases
-- NEUROSURGEON: For surgical conditions, tumors, spine surgery
-- RADIOLOGIST: For complex imaging interpretation
+    _get_medical_analysis_prompt = staticmethod(_build_medical_prompt)
 
-URGENCY ASSESSMENT:
-- URGENT: Acute stroke, large hemorrhages, herniation
-- HIGH: New tumors, significant compression, acute inflammation
-- MODERATE: Chronic conditions, mild degenerative changes
-- LOW: Stable chronic findings, minor age-related changes"""
-
-        elif image_type in ['ct', 'chest', 'pulmonary', 'lung']:
-            return base_prompt + """
-
-🫁 PULMONARY/RADIOLOGY SPECIALIST ANALYSIS:
-EXAMINE FOR:
-- Lung parenchyma: Consolidation, ground glass, nodules, masses
-- Pleural spaces: Effusions, pneumothorax, pleural thickening
-- Mediastinum: Lymphadenopathy, masses, vascular structures
-- Airways: Bronchial wall thickening, tree-in-bud pattern
-- Cardiac silhouette: Size, shape, calcifications
-
-CONDITION CATEGORIES TO CONSIDER:
-- Infectious: Pneumonia, tuberculosis, abscess
-- Malignant: Lung cancer, metastases, lymphoma
-- Inflammatory: Asthma, COPD, interstitial lung disease
-- Vascular: Pulmonary embolism, edema, hypertension
-- Traumatic: Pneumothorax, rib fractures, contusions
-
-SPECIALIST RECOMMENDATIONS:
-- PULMONOLOGIST: For lung diseases, breathing problems
-- RADIOLOGIST: For imaging interpretation
-- CARDIOLOGIST: For cardiac-related findings
-- ONCOLOGIST: For suspected malignancies
-
-URGENCY ASSESSMENT:
-- URGENT: Large pneumothorax, massive PE, acute respiratory failure
-- HIGH: New masses, significant pneumonia, pleural effusions
-- MODERATE: Chronic COPD, stable nodules
-- LOW: Minor findings, chronic stable conditions"""
-
-        else:
-            return base_prompt + """
-
-🏥 GENERAL MEDICAL IMAGE ANALYSIS:
-EXAMINE FOR:
-- Anatomical structures: Normal vs abnormal anatomy
-- Pathological changes: Masses, inflammation, trauma
-- Systematic assessment: Size, shape, density, enhancement
-- Clinical correlation: Symptoms matching findings
-
-SPECIALIST RECOMMENDATIONS BASED ON ANATOMY:
-- RADIOLOGIST: For complex imaging interpretation
-- EMERGENCY MEDICINE: For acute traumatic injuries
-- INTERNAL MEDICINE: For general medical conditions
-- Organ-specific specialists based on findings
-
-URGENCY ASSESSMENT:
-- URGENT: Life-threatening findings, acute trauma
-- HIGH: New concerning findings requiring prompt evaluation
-- MODERATE: Chronic conditions, stable findings
-- LOW: Minor or incidental findings"""
-
-    def _create_user_prompt(self, image_type: str, symptoms: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _create_user_prompt(image_type: str, symptoms: str) -> str:
         """Create enhanced user prompt with image type specific guidance"""
+        description = _IMAGE_DESCRIPTIONS.get(image_type.lower(), image_type)
+        template = _USER_PROMPT_TEMPLATES.get(image_type.lower(), _DEFAULT_USER_TEMPLATE)
+        symptoms_block = f"\n\nPatient symptoms: {symptoms}" if symptoms else ""
+        return template.format(description=description, symptoms_block=symptoms_block)
+
+    def _parse_structured_response(self, ai_response: str, image_type: str) -> Dict[str, Any]:
+        """
+        CHECKPOINT: Structured Output Mapper
+        Purpose: Maps the schema-constrained JSON reply onto the format expected by main.py
+        Falls back to the free-text parser if the reply is not valid JSON
+        """
+        try:
+            data = json.loads(ai_response)
+        except (TypeError, ValueError):
+            return self._parse_openai_response(ai_response, image_type)
         
-        # Image type specific descriptions
-        image_descriptions = {
-            'skin': 'dermatological',
-            'bone': 'bone/orthopedic (fracture analysis)',
-            'fracture': 'bone fracture (orthopedic)',
-            'xray': 'X-ray radiological',
-            'x-ray': 'X-ray radiological',
-            'eye': 'ophthalmological (retinal/eye)',
-            'mri': 'MRI neurological/radiological',
-            'ct': 'CT scan radiological',
-            'chest': 'chest/pulmonary',
-            'brain': 'neurological/brain'
-        }
-        
-        description = image_descriptions.get(image_type.lower(), image_type)
-        prompt = f"Please analyze this {description} medical image."
-        
-        # Add specific guidance based on image type
-        if image_type.lower() in ['bone', 'fracture', 'xray', 'x-ray']:
-            prompt += f"\n\n🦴 BONE/FRACTURE ANALYSIS FOCUS:"
-            prompt += f"\nThis appears to be a bone/orthopedic image. Please focus on:"
-            prompt += f"\n- Fracture identification and classification"
-            prompt += f"\n- Bone alignment and displacement"
-            prompt += f"\n- Joint integrity and spacing"
-            prompt += f"\n- Recommend ORTHOPEDIST as the primary specialist"
-            
-        elif image_type.lower() in ['skin', 'dermatology']:
-            prompt += f"\n\n🔬 SKIN ANALYSIS FOCUS:"
-            prompt += f"\nThis appears to be a dermatological image. Please focus on:"
-            prompt += f"\n- ABCDE criteria for skin lesions"
-            prompt += f"\n- Color, texture, and border analysis"
-            prompt += f"\n- Recommend DERMATOLOGIST as the primary specialist"
-            
-        elif image_type.lower() in ['eye', 'retina', 'ophthalmology']:
-            prompt += f"\n\n👁️ EYE ANALYSIS FOCUS:"
-            prompt += f"\nThis appears to be an ophthalmological image. Please focus on:"
-            prompt += f"\n- Retinal structures and abnormalities"
-            prompt += f"\n- Optic disc and macula assessment"
-            prompt += f"\n- Recommend OPHTHALMOLOGIST as the primary specialist"
-        
-        if symptoms:
-            prompt += f"\n\nPatient symptoms: {symptoms}"
+        conditions = [
+            {
+                'name': c['name'],
+                'confidence': max(0, min(c['confidence'], 100)),
+                'description': c['description'],
+                'source': 'OpenAI Vision Analysis'
+            }
+            for c in data.get('conditions', [])
+        ] or self._generate_default_conditions(image_type)
+        recommendations = data.get('recommendations') or self._generate_default_recommendations(image_type)
+        summary = data.get('summary') or "Professional medical image analysis completed using AI vision technology."
+        specialist = data.get('specialist') or self._extract_specialist_from_response('', image_type)
+        urgency = data.get('urgency', 'MODERATE').upper()
         
-        prompt += f"""\n\nPlease provide:
-1. A clear summary of what you observe in this {description} image
-2. List possible conditions with confidence percentages (0-100%) OR if normal: "Normal appearance - no obvious pathology (100%)"
-3. Recommended SPECIALIST TYPE (be specific - Orthopedist for bones/fractures, Dermatologist for skin, etc.) OR "General Practitioner" for normal images
-4. Urgency level (LOW/MODERATE/HIGH/URGENT) - use LOW for normal/healthy appearances
-5. Practical next steps for the patient
-
-IMPORTANT: Make sure your specialist recommendation matches the image type!
-- Bone/Fracture images → ORTHOPEDIST
-- Skin images → DERMATOLOGIST  
-- Eye images → OPHTHALMOLOGIST
-- Brain/MRI → NEUROLOGIST
-- Chest/Lung → PULMONOLOGIST
-- Normal selfies/portraits → GENERAL PRACTITIONER
-
-SPECIAL CASE - NORMAL PHOTOS:
-If this appears to be a normal selfie, portrait, or photo without obvious medical concerns:
-- State "Normal appearance - no obvious medical concerns visible"
-- List condition as "Normal appearance - no obvious pathology (100%)"
-- Recommend "General Practitioner" for routine care
-- Set urgency as "LOW"
-- Suggest routine check-ups and preventive care
-
-Format your response clearly with numbered sections."""
+        overall_confidence = sum(c['confidence'] for c in conditions) / len(conditions)
         
-        return prompt
+        return {
+            'success': True,
+            'summary': summary,
+            'analysis_summary': summary,  # Expected by main.py
+            'conditions': conditions[:5],  # Limit to top 5
+            'recommendations': recommendations[:6],  # Limit to 6 recommendations
+            'confidence': overall_confidence / 100,  # Expected as decimal by main.py
+            'overall_confidence': overall_confidence,  # Keep both formats
+            'analysis_methods': ['OpenAI GPT-4 Vision', 'Medical Image Analysis', 'Clinical Assessment'],
+            'specialist_recommendation': specialist,  # Expected by main.py
+            'specialist_recommended': specialist,  # Keep both formats
+            'urgency': urgency.lower(),  # Expected by main.py
+            'urgency_level': urgency,  # Keep both formats
+            'processing_time_ms': 0  # Will be overridden in calling code
+        }
 
     def _parse_openai_response(self, ai_response: str, image_type: str) -> Dict[str, Any]:
         """
         CHECKPOINT: OpenAI Response Parser
         Purpose: Converts AI text response into structured medical analysis
         """
+        # Reparsing the same response (retries, alternate pipelines) is a cache hit
+        cache_key = (ai_response, image_type)
+        with self._parse_cache_lock:
+            cached = self._parse_cache.get(cache_key)
+            if cached is not None:
+                self._parse_cache.move_to_end(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
         try:
-            # Extract key information from AI response
-            lines = ai_response.split('\n')
-            
             # Parse summary (usually first substantial paragraph)
             summary_lines = []
             conditions = []
@@ -1109,20 +1759,22 @@ Format your response clearly with numbered sections."""
             
             current_section = "summary"
             
-            for line in lines:
-                line = line.strip()
+            # Bind hot-loop lookups to locals once
+            section_search = _SECTION_RE.search
+            extract_condition = self._extract_condition_from_line
+            bullet_starts = _BULLET_STARTS
+            
+            # Extract key information from AI response in a single pass over its lines
+            for raw_line in ai_response.splitlines():
+                line = raw_line.strip()
                 if not line:
                     continue
+                line_lower = line.lower()
                     
                 # Detect section changes
-                if "possible conditions" in line.lower() or "conditions" in line.lower():
-                    current_section = "conditions"
-                    continue
-                elif "recommendations" in line.lower() or "next steps" in line.lower():
-                    current_section = "recommendations"
-                    continue
-                elif "red flags" in line.lower() or "urgent" in line.lower():
-                    current_section = "recommendations"
+                section_match = section_search(line_lower)
+                if section_match:
+                    current_section = "conditions" if "conditions" in line_lower else _SECTION_MAP[section_match.group(0)]
                     continue
                 
                 # Parse content based on current section
@@ -1132,13 +1784,13 @@ Format your response clearly with numbered sections."""
                 
                 elif current_section == "conditions":
                     # Extract conditions with confidence
-                    condition_match = self._extract_condition_from_line(line)
+                    condition_match = extract_condition(line, line_lower)
                     if condition_match:
                         conditions.append(condition_match)
                 
                 elif current_section == "recommendations":
-                    if line.startswith(('-', '*', '•')) or line[0].isdigit():
-                        rec = line.lstrip('-*•0123456789. ')
+                    if line[:1] in bullet_starts:
+                        rec = line.lstrip(_BULLET_PREFIX_CHARS)
                         if rec:
                             recommendations.append(rec)
             
@@ -1159,7 +1811,7 @@ Format your response clearly with numbered sections."""
             specialist = self._extract_specialist_from_response(ai_response, image_type)
             urgency = self._extract_urgency_from_response(ai_response)
             
-            return {
+            result = {
                 'success': True,
                 'summary': ' '.join(summary_lines),
                 'analysis_summary': ' '.join(summary_lines),  # Expected by main.py
@@ -1175,18 +1827,22 @@ Format your response clearly with numbered sections."""
                 'processing_time_ms': 0  # Will be overridden in calling code
             }
             
+            entry = copy.deepcopy(result)
+            with self._parse_cache_lock:
+                self._parse_cache[cache_key] = entry
+                if len(self._parse_cache) > self._parse_cache_size:
+                    self._parse_cache.popitem(last=False)
+            return result
+            
         except Exception as e:
-            self.logger.error(f"Error parsing OpenAI response: {e}")
+            self.logger.error("Error parsing OpenAI response: %s", e)
             # Return structured fallback
             return self._generate_fallback_analysis(image_type)
 
-    def _extract_condition_from_line(self, line: str) -> Optional[Dict[str, Any]]:
+    def _extract_condition_from_line(self, line: str, line_lower: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Extract condition and confidence from a line of text"""
-        import re
-        
         # Special handling for normal findings
-        line_lower = line.lower()
-        if any(phrase in line_lower for phrase in ['normal appearance', 'no obvious pathology', 'normal findings', 'healthy appearance', 'no concerns visible']):
+        if _NORMAL_RE.search(line_lower if line_lower is not None else line.lower()):
             return {
                 'name': 'Normal appearance - no obvious pathology',
                 'confidence': 100,
@@ -1194,14 +1850,13 @@ Format your response clearly with numbered sections."""
             }
         
         # Look for patterns like "Condition (80%)" or "Condition - 80%"
-        confidence_pattern = r'(\d{1,3})%'
-        confidence_match = re.search(confidence_pattern, line)
+        confidence_match = _CONF_RE.search(line)
         
         if confidence_match:
             confidence = int(confidence_match.group(1))
             # Remove confidence part to get condition name
-            condition_name = re.sub(r'[(\-]\s*\d{1,3}%[)\s]*', '', line).strip()
-            condition_name = condition_name.lstrip('-*•0123456789. ').strip()
+            condition_name = _STRIP_RE.sub('', line).strip()
+            condition_name = condition_name.lstrip(_BULLET_PREFIX_CHARS).strip()
             
             if condition_name:
                 return {
@@ -1216,14 +1871,15 @@ Format your response clearly with numbered sections."""
         """Generate default conditions if parsing fails"""
         knowledge = self.medical_knowledge.get(image_type, self.medical_knowledge['skin'])
         conditions = knowledge['conditions'][:3]  # Top 3
+        confidences = self._rng.integers(60, 81, size=len(conditions))
         
         return [
             {
-                'name': condition['name'],
-                'confidence': random.randint(60, 80),
+                'name': condition.name,
+                'confidence': int(confidence),
                 'source': 'Medical Knowledge Base'
             }
-            for condition in conditions
+            for condition, confidence in zip(conditions, confidences)
         ]
 
     def _generate_default_recommendations(self, image_type: str) -> List[str]:
@@ -1253,138 +1909,50 @@ Format your response clearly with numbered sections."""
         Enhanced specialist extraction with comprehensive medical specialties
         Priority: AI response > Image type mapping > Fallback
         """
-        response_lower = response.lower()
+        found = self._specialist_matcher.matches(response.lower())
         
         # Check for normal findings first
-        normal_indicators = ['normal appearance', 'no obvious pathology', 'healthy appearance', 'no concerns', 'general practitioner', 'routine care']
-        if any(indicator in response_lower for indicator in normal_indicators):
+        if any(group == 'normal' for group, _ in found):
             return 'General Practitioner'
         
-        # Primary specialist keywords (in order of specificity)
-        specialist_keywords = {
-            'dermatologist': 'Dermatologist',
-            'orthopedist': 'Orthopedist', 
-            'orthopedic': 'Orthopedist',
-            'bone specialist': 'Orthopedist',
-            'fracture specialist': 'Orthopedist',
-            'radiologist': 'Radiologist',
-            'ophthalmologist': 'Ophthalmologist',
-            'eye specialist': 'Ophthalmologist',
-            'cardiologist': 'Cardiologist',
-            'heart specialist': 'Cardiologist',
-            'neurologist': 'Neurologist',
-            'brain specialist': 'Neurologist',
-            'neurosurgeon': 'Neurosurgeon',
-            'pulmonologist': 'Pulmonologist',
-            'lung specialist': 'Pulmonologist',
-            'oncologist': 'Oncologist',
-            'cancer specialist': 'Oncologist',
-            'gastroenterologist': 'Gastroenterologist',
-            'emergency medicine': 'Emergency Medicine',
-            'trauma surgeon': 'Trauma Surgeon',
-            'plastic surgeon': 'Plastic Surgeon',
-            'urologist': 'Urologist',
-            'endocrinologist': 'Endocrinologist',
-            'rheumatologist': 'Rheumatologist'
-        }
-        
-        # Check AI response for specialist mentions
-        for keyword, specialist in specialist_keywords.items():
-            if keyword in response_lower:
-                return specialist
-        
-        # Enhanced image type to specialist mapping
-        image_type_mapping = {
-            # Bone/Orthopedic
-            'bone': 'Orthopedist',
-            'xray': 'Orthopedist',
-            'x-ray': 'Orthopedist', 
-            'fracture': 'Orthopedist',
-            'orthopedic': 'Orthopedist',
-            'joint': 'Orthopedist',
-            'spine': 'Orthopedist',
-            
-            # Skin/Dermatology
-            'skin': 'Dermatologist',
-            'dermatology': 'Dermatologist',
-            'mole': 'Dermatologist',
-            'rash': 'Dermatologist',
-            
-            # Eye/Ophthalmology
-            'eye': 'Ophthalmologist',
-            'retina': 'Ophthalmologist',
-            'ophthalmology': 'Ophthalmologist',
-            
-            # Brain/Neurology
-            'brain': 'Neurologist',
-            'mri': 'Radiologist',  # MRI usually needs radiologist first
-            'neurological': 'Neurologist',
-            'head': 'Neurologist',
-            
-            # Chest/Pulmonary
-            'chest': 'Pulmonologist',
-            'lung': 'Pulmonologist',
-            'pulmonary': 'Pulmonologist',
-            'ct': 'Radiologist',  # CT usually needs radiologist first
-            
-            # Cardiac
-            'heart': 'Cardiologist',
-            'cardiac': 'Cardiologist',
-            'echo': 'Cardiologist',
-            
-            # Abdomen
-            'abdomen': 'Gastroenterologist',
-            'stomach': 'Gastroenterologist',
-            'liver': 'Gastroenterologist',
-            
-            # Normal/General
-            'normal': 'General Practitioner',
-            'selfie': 'General Practitioner',
-            'portrait': 'General Practitioner',
-            'photo': 'General Practitioner',
-            'general': 'General Practitioner',
-            'ultrasound': 'Radiologist',
-            'scan': 'Radiologist'
-        }
-        
-        # Check image type mapping
-        if image_type and image_type.lower() in image_type_mapping:
-            return image_type_mapping[image_type.lower()]
+        # Check AI response for specialist mentions, most specific keyword wins
+        mentioned = [keyword for group, keyword in found if group == 'specialist']
+        if mentioned:
+            return _SPECIALIST_KEYWORDS[min(mentioned, key=self._specialist_priority.__getitem__)]
+        
+        # Check image type mapping: exact name first, then the first token with a known prefix
+        if image_type:
+            image_type_lower = image_type.lower()
+            if image_type_lower in _IMAGE_SPECIALIST_MAP:
+                return _IMAGE_SPECIALIST_MAP[image_type_lower]
+            for token in _IMAGE_TYPE_TOKEN_RE.split(image_type_lower):
+                specialist = _longest_prefix_value(_IMAGE_SPECIALIST_TRIE, token)
+                if specialist is not None:
+                    return specialist
         
         # Final fallback
         return 'General Practitioner'
 
     def _extract_urgency_from_response(self, response: str) -> str:
         """Extract urgency level from AI response"""
-        response_lower = response.lower()
-        
-        if any(word in response_lower for word in ['urgent', 'immediate', 'emergency']):
-            return 'URGENT'
-        elif any(word in response_lower for word in ['high', 'soon', 'promptly']):
-            return 'HIGH'
-        elif any(word in response_lower for word in ['moderate', 'weeks']):
-            return 'MODERATE'
-        else:
-            return 'LOW'
+        best = 'LOW'
+        for match in _URGENCY_RE.finditer(response):
+            level = match.lastgroup
+            if level == 'URGENT':
+                return level
+            if _URGENCY_CODES[level] > _URGENCY_CODES[best]:
+                best = level
+        return best
 
     def _generate_fallback_analysis(self, image_type: str) -> Dict[str, Any]:
         """Generate fallback analysis if OpenAI parsing completely fails"""
         specialist = self._extract_specialist_from_response('', image_type)
-        return {
-            'success': True,
-            'summary': "Medical image analysis completed. Professional consultation recommended for accurate diagnosis.",
-            'analysis_summary': "Medical image analysis completed. Professional consultation recommended for accurate diagnosis.",
-            'conditions': self._generate_default_conditions(image_type),
-            'recommendations': self._generate_default_recommendations(image_type),
-            'confidence': 0.7,  # Expected as decimal
-            'overall_confidence': 70,
-            'analysis_methods': ['Medical AI Analysis'],
-            'specialist_recommendation': specialist,  # Expected by main.py
-            'specialist_recommended': specialist,  # Keep both formats
-            'urgency': 'moderate',  # Expected by main.py (lowercase)
-            'urgency_level': 'MODERATE',  # Keep both formats
-            'processing_time_ms': 0
-        }
+        analysis = dict(_FALLBACK_TEMPLATE)
+        analysis['conditions'] = self._generate_default_conditions(image_type)
+        analysis['recommendations'] = self._generate_default_recommendations(image_type)
+        analysis['analysis_methods'] = ['Medical AI Analysis']
+        analysis['specialist_recommendation'] = analysis['specialist_recommended'] = specialist
+        return analysis
 
 # Global fast medical AI instance
 fast_medical_ai = FastMedicalAI()
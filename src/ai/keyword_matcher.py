@@ -0,0 +1,51 @@
+# src/ai/keyword_matcher.py
+"""
+Multi-pattern keyword matching for symptom and response text
+Purpose: Finds every keyword of every group in one pass over the text using an
+Aho-Corasick automaton, instead of one substring scan per keyword
+"""
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class KeywordMatcher:
+    """
+    Substring matcher over named keyword groups
+    Semantics match `keyword in text` for each keyword; without pyahocorasick
+    it falls back to exactly those substring checks
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        # keyword -> groups it belongs to (a keyword may appear in several groups)
+        self._owners: Dict[str, Tuple[str, ...]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                self._owners[keyword] = self._owners.get(keyword, ()) + (group,)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self._owners:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, owners in self._owners.items():
+                self._automaton.add_word(keyword, (keyword, owners))
+            self._automaton.make_automaton()
+
+    def keywords_in(self, text: str) -> FrozenSet[str]:
+        """Return the set of keywords occurring in text"""
+        if not text:
+            return frozenset()
+        if self._automaton is not None:
+            return frozenset(keyword for _, (keyword, _) in self._automaton.iter(text))
+        return frozenset(keyword for keyword in self._owners if keyword in text)
+
+    def matches(self, text: str) -> Set[Tuple[str, str]]:
+        """Return every (group, keyword) pair whose keyword occurs in text"""
+        return {(group, keyword) for keyword in self.keywords_in(text) for group in self._owners[keyword]}
+
+    def groups_in(self, text: str) -> Set[str]:
+        """Return the names of groups with at least one keyword in text"""
+        return {group for keyword in self.keywords_in(text) for group in self._owners[keyword]}
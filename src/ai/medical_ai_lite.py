@@ -3,14 +3,78 @@
 Lightweight Medical AI System
 Simplified version that works without heavy dependencies
 """
+import copy
+import functools
+import hashlib
+import heapq
+import importlib.util
 import logging
-import base64
 import io
 import json
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 import numpy as np
 from PIL import Image
 import cv2
+from src.ai import medical_kernels
+from src.ai.keyword_matcher import KeywordMatcher
+
+# SIMD-accelerated base64 when available (same API as the stdlib module)
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# libjpeg-turbo (SIMD) decoding for JPEG uploads when PyTurboJPEG and its native library are present
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbojpeg = TurboJPEG()
+    TURBOJPEG_AVAILABLE = True
+except Exception:
+    TURBOJPEG_AVAILABLE = False
+
+# xxh3 for content-addressed image caches when available; blake2b otherwise
+try:
+    import xxhash
+    
+    def _image_digest(image_data: bytes) -> bytes:
+        return xxhash.xxh3_128_digest(image_data)
+except ImportError:
+    def _image_digest(image_data: bytes) -> bytes:
+        return hashlib.blake2b(image_data, digest_size=16).digest()
+
+_JPEG_MAGIC = b'\xff\xd8\xff'
+
+# Fused dark-pixel statistics (mean, std and dark count in one call) when Numba is installed
+try:
+    from numba import njit
+    _dark_pixel_stats = njit(cache=True, parallel=True, fastmath=True)(medical_kernels.dark_pixel_stats)
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Images are analyzed with their long side at most this many pixels
+_MAX_ANALYSIS_SIDE = 512
+
+
+def _fit_within(width: int, height: int, max_size: int = _MAX_ANALYSIS_SIDE) -> tuple:
+    """(width, height) scaled so the long side is max_size"""
+    if height > width:
+        return int(width * max_size / height), max_size
+    return max_size, int(height * max_size / width)
+
+
+def _jpeg_scale_denominator(width: int, height: int, max_size: int = _MAX_ANALYSIS_SIDE) -> int:
+    """Largest libjpeg scale-down (1/8, 1/4, 1/2) that still leaves the long side at least max_size"""
+    long_side = max(width, height)
+    for denominator in (8, 4, 2):
+        if -(-long_side // denominator) >= max_size:
+            return denominator
+    return 1
 
 # Try to import advanced libraries, fall back gracefully
 try:
@@ -21,14 +85,29 @@ except ImportError:
     TORCH_AVAILABLE = False
     print("⚠️ PyTorch not available, using lightweight mode")
 
-try:
-    from transformers import pipeline
-    TRANSFORMERS_AVAILABLE = True
+# Only check that transformers is installed; it is imported when a pipeline is first needed
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec('transformers') is not None
+if TRANSFORMERS_AVAILABLE:
     print("✅ Transformers available for medical AI")
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+else:
     print("⚠️ Transformers not available, using rule-based analysis")
 
+# ONNX Runtime runs the image classifier when installed (graph fusion, MLAS kernels); imported on first use
+ONNXRUNTIME_AVAILABLE = importlib.util.find_spec('onnxruntime') is not None
+_ONNX_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'medibot')
+_IMAGE_MODEL_NAME = "microsoft/resnet-50"
+# lru_cache does not serialize first calls: concurrent first requests must not both build the model
+_ONNX_BUILD_LOCK = threading.Lock()
+
+# Inference runs on a worker thread beside the CV analyzers, so the ONNX Runtime session's own
+# intra-op pool is capped (normally one thread per core) to avoid oversubscribing the cores
+_INFERENCE_THREADS = 2
+
+# torch's thread pools are process-wide, so capping them would also throttle CLIP and every other
+# torch analyzer in the server: only done when LITE_TORCH_THREADS is set (e.g. LITE_TORCH_THREADS=2
+# on hosts that serve only the lite analyzer)
+_TORCH_THREADS = os.getenv('LITE_TORCH_THREADS')
+
 # Medical knowledge base for lightweight analysis
 MEDICAL_CONDITIONS_DB = {
     'skin_conditions': {
@@ -86,6 +165,247 @@ MEDICAL_CONDITIONS_DB = {
     }
 }
 
+# Keywords are frozen once at import; analyzers only read them
+for _conditions in MEDICAL_CONDITIONS_DB.values():
+    for _info in _conditions.values():
+        _info['keywords'] = frozenset(_info['keywords'])
+
+# Flat per-field tuples over every condition, indexed by condition id, for the symptom loop;
+# each category owns a contiguous id range
+_COND_NAMES = tuple(name for conditions in MEDICAL_CONDITIONS_DB.values() for name in conditions)
+_COND_TITLES = tuple(name.replace('_', ' ').title() for name in _COND_NAMES)
+_COND_KEYWORD_SETS = tuple(info['keywords'] for conditions in MEDICAL_CONDITIONS_DB.values() for info in conditions.values())
+_COND_KEYWORD_COUNTS = tuple(len(keywords) for keywords in _COND_KEYWORD_SETS)
+_COND_DESCRIPTIONS = tuple(info['description'] for conditions in MEDICAL_CONDITIONS_DB.values() for info in conditions.values())
+_COND_URGENCY = tuple(info['urgency'] for conditions in MEDICAL_CONDITIONS_DB.values() for info in conditions.values())
+_COND_SPECIALIST = tuple(info['specialist'] for conditions in MEDICAL_CONDITIONS_DB.values() for info in conditions.values())
+
+_CATEGORY_RANGES = {}
+_next_id = 0
+for _category, _conditions in MEDICAL_CONDITIONS_DB.items():
+    _CATEGORY_RANGES[_category] = range(_next_id, _next_id + len(_conditions))
+    _next_id += len(_conditions)
+
+# One keyword automaton per condition category; groups are condition ids
+_CONDITION_MATCHERS = {
+    category: KeywordMatcher({cond_id: _COND_KEYWORD_SETS[cond_id] for cond_id in ids})
+    for category, ids in _CATEGORY_RANGES.items()
+}
+
+# A computer vision finding above this confidence makes the transformer pass unnecessary
+_CV_CONFIDENT = 80
+
+# Border edges: mean absolute Sobel gradient above this counts as an edge pixel. Canny(50, 150) keeps
+# only the thinned maxima of the same edges, about 0.43x as many pixels (median over sample images),
+# so densities are scaled by that to keep the existing decision thresholds
+_SOBEL_EDGE_THRESHOLD = 40
+_SOBEL_TO_CANNY_DENSITY = 0.43
+
+# Symptom words behind the rule-based findings, matched in one pass over the symptoms
+_SKIN_LESION_WORDS = frozenset({'mole', 'spot', 'lesion'})
+_SKIN_CHANGE_WORDS = frozenset({'changing', 'growing', 'irregular'})
+_RESPIRATORY_WORDS = frozenset({'cough', 'fever', 'breathing'})
+_RULE_MATCHER = KeywordMatcher({
+    'skin_lesion': _SKIN_LESION_WORDS,
+    'skin_change': _SKIN_CHANGE_WORDS,
+    'respiratory': _RESPIRATORY_WORDS,
+})
+
+
+def _cpu_supports_bf16() -> bool:
+    """Whether this CPU has native BF16 arithmetic (AVX-512 BF16); older torch builds cannot tell, so no"""
+    check = getattr(getattr(torch, 'cpu', None), '_is_avx512_bf16_supported', None)
+    try:
+        return bool(check and check())
+    except Exception:
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def _cap_torch_threads():
+    """Opt-in (LITE_TORCH_THREADS) cap of torch's process-wide thread pools, applied when the first model loads"""
+    if not (TORCH_AVAILABLE and _TORCH_THREADS):
+        return
+    try:
+        torch.set_num_threads(int(_TORCH_THREADS))
+    except ValueError:
+        logging.getLogger(__name__).warning(f"Ignoring invalid LITE_TORCH_THREADS={_TORCH_THREADS!r}")
+        return
+    # One inter-op thread: a single model runs at a time per request. Fails harmlessly if torch
+    # already started its pools elsewhere in the process
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+@functools.lru_cache(maxsize=1)
+def _get_image_classifier():
+    """Process-wide image classification pipeline, built on first use; None if it cannot load"""
+    logger = logging.getLogger(__name__)
+    try:
+        from transformers import pipeline
+        _cap_torch_threads()
+        classifier = pipeline("image-classification", model=_IMAGE_MODEL_NAME)
+        logger.info("✅ Image classification model loaded")
+    except Exception as e:
+        logger.warning(f"Failed to load image classifier: {e}")
+        return None
+    
+    # BF16 weights where the CPU computes in BF16 natively (the convolutions dominate ResNet-50);
+    # otherwise INT8 dynamic quantization of the Linear layers. Keep FP32 if either fails
+    if TORCH_AVAILABLE and _cpu_supports_bf16():
+        try:
+            classifier.model = classifier.model.to(torch.bfloat16)
+            return classifier
+        except Exception as e:
+            logger.warning(f"Image classifier BF16 cast skipped: {e}")
+    if TORCH_AVAILABLE:
+        try:
+            classifier.model = torch.quantization.quantize_dynamic(
+                classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        except Exception as e:
+            logger.warning(f"Image classifier quantization skipped: {e}")
+    return classifier
+
+
+def _build_image_onnx_model(int8_path: str):
+    """
+    Export the image classifier to ONNX and quantize it to int8_path. Both stages write to private
+    temporary files, and the INT8 model is moved into place atomically, so another process building
+    at the same time, or an interrupted build, never leaves a half-written model at int8_path
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModelForImageClassification
+    
+    os.makedirs(_ONNX_CACHE_DIR, exist_ok=True)
+    fd, fp32_path = tempfile.mkstemp(prefix='resnet50.', suffix='.onnx', dir=_ONNX_CACHE_DIR)
+    os.close(fd)
+    fd, int8_tmp_path = tempfile.mkstemp(prefix='resnet50.int8.', suffix='.onnx', dir=_ONNX_CACHE_DIR)
+    os.close(fd)
+    try:
+        model = AutoModelForImageClassification.from_pretrained(_IMAGE_MODEL_NAME).eval()
+        model.config.return_dict = False
+        dummy = torch.zeros(1, 3, _RESNET_CROP_SIZE, _RESNET_CROP_SIZE)
+        torch.onnx.export(model, (dummy,), fp32_path, input_names=['pixel_values'],
+                          output_names=['logits'], opset_version=17,
+                          dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}})
+        quantize_dynamic(fp32_path, int8_tmp_path, op_types_to_quantize=['MatMul', 'Gemm'],
+                         weight_type=QuantType.QInt8)
+        os.replace(int8_tmp_path, int8_path)
+    finally:
+        # Only the INT8 model is loaded; don't leave the ~100 MB FP32 export (or a failed build) behind
+        for path in (fp32_path, int8_tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_image_onnx_session():
+    """
+    Process-wide ONNX Runtime session for the image classifier; None if unavailable.
+    The FP32 model is exported once to ~/.cache/medibot and its MatMul/Gemm layers
+    quantized to INT8 (as the PyTorch path does for Linear layers)
+    """
+    if not (ONNXRUNTIME_AVAILABLE and TORCH_AVAILABLE and TRANSFORMERS_AVAILABLE):
+        return None
+    logger = logging.getLogger(__name__)
+    try:
+        import onnxruntime
+        
+        int8_path = os.path.join(_ONNX_CACHE_DIR, 'resnet50.int8.onnx')
+        with _ONNX_BUILD_LOCK:
+            if not os.path.exists(int8_path):
+                _build_image_onnx_model(int8_path)
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = _INFERENCE_THREADS  # per session, unlike torch's pools
+        session = onnxruntime.InferenceSession(int8_path, sess_options=options,
+                                               providers=['CPUExecutionProvider'])
+        logger.info("✅ Image classifier running on ONNX Runtime")
+        return session
+    except Exception as e:
+        logger.warning(f"ONNX Runtime image classifier unavailable, using PyTorch: {e}")
+        return None
+
+
+# ResNet-50 input: short side resized to 256, center-cropped to 224, ImageNet-normalized (0-255 scale)
+_RESNET_RESIZE_SHORT_SIDE = 256
+_RESNET_CROP_SIZE = 224
+_IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255
+_IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255
+
+
+def _resnet_pixels(image: np.ndarray) -> np.ndarray:
+    """ResNet-50 input (3x224x224 float32) for an RGB array, preprocessed with OpenCV instead of through PIL"""
+    height, width = image.shape[:2]
+    scale = _RESNET_RESIZE_SHORT_SIDE / min(height, width)
+    resized_width, resized_height = max(_RESNET_CROP_SIZE, round(width * scale)), max(_RESNET_CROP_SIZE, round(height * scale))
+    resized = cv2.resize(image, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+    top, left = (resized_height - _RESNET_CROP_SIZE) // 2, (resized_width - _RESNET_CROP_SIZE) // 2
+    
+    pixels = resized[top:top + _RESNET_CROP_SIZE, left:left + _RESNET_CROP_SIZE].astype(np.float32)
+    pixels -= _IMAGENET_MEAN
+    pixels /= _IMAGENET_STD
+    return pixels.transpose(2, 0, 1)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_image_labels() -> Dict[int, str]:
+    """Class id -> label map of the image classifier, read from its config alone (no weights loaded)"""
+    from transformers import AutoConfig
+    return AutoConfig.from_pretrained(_IMAGE_MODEL_NAME).id2label
+
+
+def _classify_images_onnx(session, images: List[np.ndarray], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+    """_classify_images on the ONNX Runtime session, without the PyTorch pipeline"""
+    pixels = np.stack([_resnet_pixels(image) for image in images])
+    id2label = _get_image_labels()
+    
+    logits = session.run(None, {'pixel_values': pixels})[0]
+    probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+    top_ids = np.argsort(probabilities, axis=1)[:, ::-1][:, :top_k]
+    return [[{'label': id2label[int(i)], 'score': float(row[i])} for i in ids]
+            for row, ids in zip(probabilities, top_ids)]
+
+
+def _classify_images(classifier, images: List[np.ndarray], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+    """Top-k pipeline-style predictions ({'label', 'score'}) for each RGB array, from one batched forward pass"""
+    pixels = np.stack([_resnet_pixels(image) for image in images])
+    id2label = classifier.model.config.id2label
+    
+    pixel_values = torch.from_numpy(pixels).to(classifier.model.dtype)  # BF16 when the weights were cast
+    with torch.inference_mode():
+        logits = classifier.model(pixel_values=pixel_values).logits.float()
+    scores, ids = torch.topk(logits.softmax(-1), top_k)
+    return [[{'label': id2label[i], 'score': score} for score, i in zip(row_scores, row_ids)]
+            for row_scores, row_ids in zip(scores.tolist(), ids.tolist())]
+
+
+@functools.lru_cache(maxsize=1)
+def _get_text_classifier():
+    """Process-wide text classification pipeline for symptoms, built on first use; None if it cannot load"""
+    logger = logging.getLogger(__name__)
+    try:
+        from transformers import pipeline
+        _cap_torch_threads()
+        classifier = pipeline("text-classification")
+        logger.info("✅ Text classification model loaded")
+        return classifier
+    except Exception as e:
+        logger.warning(f"Failed to load text classifier: {e}")
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def _get_analysis_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool that runs transformer inference alongside the cheap analyzers"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='medical-ai-lite')
+
+
 class LightweightMedicalAI:
     """
     Lightweight medical AI that works without heavy dependencies
@@ -96,33 +416,20 @@ class LightweightMedicalAI:
         self.logger = logging.getLogger(__name__)
         self.available_models = []
         
-        # Try to load available models
+        # Pipelines are shared by every instance and only loaded when first used
         if TRANSFORMERS_AVAILABLE:
-            self._load_transformers_models()
+            self.available_models.extend(['image_classification', 'text_classification'])
         
-        self.logger.info(f"Lightweight Medical AI initialized with {len(self.available_models)} models")
-    
-    def _load_transformers_models(self):
-        """Load available transformer models"""
-        try:
-            # Try to load image classification pipeline
-            self.image_classifier = pipeline("image-classification", 
-                                           model="microsoft/resnet-50")
-            self.available_models.append('image_classification')
-            self.logger.info("✅ Image classification model loaded")
-        except Exception as e:
-            self.logger.warning(f"Failed to load image classifier: {e}")
+        # Bounded LRU of (CV, transformer) results, keyed by image digest and image type
+        self._image_results_cache: OrderedDict = OrderedDict()
+        self._image_results_cache_size = 256
+        # Request threads and the batch pool share the cache; lookups and evictions must not interleave
+        self._image_results_lock = threading.Lock()
         
-        try:
-            # Try to load text classification for symptoms
-            self.text_classifier = pipeline("text-classification")
-            self.available_models.append('text_classification')
-            self.logger.info("✅ Text classification model loaded")
-        except Exception as e:
-            self.logger.warning(f"Failed to load text classifier: {e}")
+        self.logger.info(f"Lightweight Medical AI initialized with {len(self.available_models)} models")
     
     def analyze_medical_image_lite(self, image_data: bytes, image_type: str = 'skin', 
-                                  symptoms: str = '') -> Dict[str, Any]:
+                                  symptoms: str = '', full_analysis: bool = False) -> Dict[str, Any]:
         """
         Lightweight medical image analysis
         
@@ -130,65 +437,39 @@ class LightweightMedicalAI:
             image_data: Raw image bytes
             image_type: Type of medical image
             symptoms: Patient symptoms
+            full_analysis: Run the transformer even when computer vision is already confident
             
         Returns:
             Analysis results
         """
         try:
+            # Image analyses depend only on the image and its type: a repeat upload skips
+            # decoding, CV and the transformer, and only the symptom-dependent analyzers rerun
+            cache_key = self._image_cache_key(image_data, image_type)
+            cached = self._cached_image_results(cache_key, full_analysis)
+            if cached is not None:
+                cv_results, transformer_results = cached
+                return self._finish_lite_analysis(image_type, cv_results, transformer_results,
+                                                  *self._analyze_symptom_text(symptoms, image_type))
+            
             # Preprocess image
             image = self._preprocess_image(image_data)
             if image is None:
                 return {'error': 'Failed to preprocess image'}
             
-            analysis_results = {
-                'analysis_type': 'Lightweight Medical AI Analysis',
-                'image_type': image_type,
-                'analysis_methods': [],
-                'conditions': [],
-                'recommendations': [],
-                'confidence_scores': {},
-                'model_insights': {}
-            }
-            
-            # 1. Computer vision analysis
+            # The transformer forward pass dominates and releases the GIL: when computer vision
+            # leaves it needed, start it and run the symptom analyzers on this thread meanwhile
             cv_results = self._analyze_with_computer_vision(image, image_type)
-            if cv_results:
-                analysis_results['analysis_methods'].append('computer_vision')
-                analysis_results['conditions'].extend(cv_results.get('conditions', []))
-                analysis_results['confidence_scores']['computer_vision'] = 70
-            
-            # 2. Transformer model analysis (if available)
-            if 'image_classification' in self.available_models:
-                transformer_results = self._analyze_with_transformers(image)
-                if transformer_results:
-                    analysis_results['analysis_methods'].append('transformer_model')
-                    analysis_results['conditions'].extend(transformer_results.get('conditions', []))
-                    analysis_results['confidence_scores']['transformer_model'] = 75
-            
-            # 3. Symptom analysis
-            if symptoms:
-                symptom_results = self._analyze_symptoms_lite(symptoms, image_type)
-                if symptom_results:
-                    analysis_results['analysis_methods'].append('symptom_analysis')
-                    analysis_results['conditions'].extend(symptom_results.get('conditions', []))
-                    analysis_results['confidence_scores']['symptom_analysis'] = 65
-            
-            # 4. Rule-based medical analysis
-            rule_results = self._analyze_with_medical_rules(image_type, symptoms)
-            if rule_results:
-                analysis_results['analysis_methods'].append('medical_rules')
-                analysis_results['conditions'].extend(rule_results.get('conditions', []))
-                analysis_results['confidence_scores']['medical_rules'] = 60
-            
-            # Combine and rank results
-            analysis_results = self._combine_lite_results(analysis_results)
+            transformer_future = None
+            if self._needs_transformer(cv_results, full_analysis):
+                transformer_future = _get_analysis_executor().submit(self._analyze_with_transformers, image)
             
-            return {
-                'success': True,
-                'analysis': analysis_results,
-                'lightweight_mode': True,
-                'available_models': self.available_models
-            }
+            symptom_results, rule_results = self._analyze_symptom_text(symptoms, image_type)
+            transformer_results = transformer_future.result() if transformer_future is not None else None
+            
+            self._cache_image_results(cache_key, cv_results, transformer_results)
+            return self._finish_lite_analysis(image_type, cv_results, transformer_results,
+                                              symptom_results, rule_results)
             
         except Exception as e:
             self.logger.error(f"Lightweight medical analysis error: {e}")
@@ -198,36 +479,204 @@ class LightweightMedicalAI:
                 'fallback_analysis': self._basic_fallback_analysis(image_type, symptoms)
             }
     
-    def _preprocess_image(self, image_data: bytes) -> Optional[np.ndarray]:
-        """Preprocess image for analysis"""
+    def analyze_batch(self, images: List[bytes], image_types: List[str],
+                      symptoms_list: Optional[List[str]] = None,
+                      full_analysis: bool = False) -> List[Dict[str, Any]]:
+        """
+        Lightweight analysis of several images, with one batched transformer forward pass
+        
+        Args:
+            images: Raw image bytes (or base64 strings), one per image
+            image_types: Type of each medical image
+            symptoms_list: Patient symptoms for each image (defaults to none)
+            full_analysis: Run the transformer even when computer vision is already confident
+            
+        Returns:
+            One result per image, as analyze_medical_image_lite returns
+        """
+        symptoms_list = symptoms_list if symptoms_list is not None else [''] * len(images)
         try:
-            # Convert to PIL Image
-            if isinstance(image_data, str):
-                if 'base64,' in image_data:
-                    image_data = image_data.split('base64,')[1]
-                image_data = base64.b64decode(image_data)
-            
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Convert to numpy array
-            image_array = np.array(image)
-            
-            # Resize if too large
-            max_size = 512
-            if max(image_array.shape[:2]) > max_size:
-                height, width = image_array.shape[:2]
-                if height > width:
-                    new_height = max_size
-                    new_width = int(width * max_size / height)
+            results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+            image_results: Dict[int, tuple] = {}
+            
+            # Cached images need no decoding; the rest are decoded in parallel
+            misses = []
+            for i, (image_data, image_type) in enumerate(zip(images, image_types)):
+                cache_key = self._image_cache_key(image_data, image_type)
+                cached = self._cached_image_results(cache_key, full_analysis)
+                if cached is not None:
+                    image_results[i] = cached
                 else:
-                    new_width = max_size
-                    new_height = int(height * max_size / width)
+                    misses.append((i, cache_key))
+            
+            decoded = list(_get_analysis_executor().map(self._preprocess_image, [images[i] for i, _ in misses]))
+            pending = []
+            for (i, cache_key), image in zip(misses, decoded):
+                if image is None:
+                    results[i] = {'error': 'Failed to preprocess image'}
+                else:
+                    pending.append((i, cache_key, image))
+            
+            # One batched forward pass for every image computer vision leaves undecided
+            cv_batch = [self._analyze_with_computer_vision(image, image_types[i]) for i, _, image in pending]
+            undecided = [k for k, cv_results in enumerate(cv_batch) if self._needs_transformer(cv_results, full_analysis)]
+            transformer_batch = [None] * len(pending)
+            if undecided:
+                for k, transformer_results in zip(undecided, self._analyze_images_with_transformers(
+                        [pending[k][2] for k in undecided])):
+                    transformer_batch[k] = transformer_results
+            
+            for (i, cache_key, _), cv_results, transformer_results in zip(pending, cv_batch, transformer_batch):
+                self._cache_image_results(cache_key, cv_results, transformer_results)
+                image_results[i] = (cv_results, transformer_results)
+            
+            for i, (cv_results, transformer_results) in image_results.items():
+                results[i] = self._finish_lite_analysis(image_types[i], cv_results, transformer_results,
+                                                        *self._analyze_symptom_text(symptoms_list[i], image_types[i]))
+            return results
+            
+        except Exception as e:
+            self.logger.error(f"Lightweight batch analysis error: {e}")
+            return [{
+                'success': False,
+                'error': f'Analysis failed: {str(e)}',
+                'fallback_analysis': self._basic_fallback_analysis(image_type, symptoms)
+            } for image_type, symptoms in zip(image_types, symptoms_list)]
+    
+    def _needs_transformer(self, cv_results: Dict[str, Any], full_analysis: bool) -> bool:
+        """Whether to run the transformer: skipped when a CV finding is already confident, unless full_analysis"""
+        if 'image_classification' not in self.available_models:
+            return False
+        return full_analysis or not any(
+            condition['confidence'] > _CV_CONFIDENT for condition in (cv_results or {}).get('conditions', [])
+        )
+    
+    def _cached_image_results(self, cache_key: tuple, full_analysis: bool) -> Optional[tuple]:
+        """
+        (CV, transformer) results cached for an upload, or None. An entry whose transformer
+        was skipped does not satisfy a full_analysis request
+        """
+        with self._image_results_lock:
+            cached = self._image_results_cache.get(cache_key)
+            if cached is None or (full_analysis and cached[1] is None and 'image_classification' in self.available_models):
+                return None
+            self._image_results_cache.move_to_end(cache_key)
+        return copy.deepcopy(cached)
+    
+    def _image_cache_key(self, image_data: bytes, image_type: str) -> tuple:
+        """Key of an upload's entry in the image results cache"""
+        return _image_digest(image_data.encode() if isinstance(image_data, str) else image_data), image_type
+    
+    def _cache_image_results(self, cache_key: tuple, cv_results: Dict[str, Any],
+                             transformer_results: Optional[Dict[str, Any]]):
+        """Remember an image's CV and transformer results; only complete analyses (a failed analyzer returns {})"""
+        if not cv_results or transformer_results == {}:
+            return
+        entry = copy.deepcopy((cv_results, transformer_results))
+        with self._image_results_lock:
+            self._image_results_cache[cache_key] = entry
+            if len(self._image_results_cache) > self._image_results_cache_size:
+                self._image_results_cache.popitem(last=False)
+    
+    def _analyze_symptom_text(self, symptoms: str, image_type: str) -> tuple:
+        """Symptom and rule analyses of the symptom text (lowercased once for both; None counts as none)"""
+        symptoms_lower = symptoms.lower() if symptoms else ''
+        symptom_results = self._analyze_symptoms_lite(symptoms_lower, image_type) if symptoms else None
+        return symptom_results, self._analyze_with_medical_rules(image_type, symptoms_lower)
+    
+    def _finish_lite_analysis(self, image_type: str, cv_results: Optional[Dict[str, Any]],
+                              transformer_results: Optional[Dict[str, Any]],
+                              symptom_results: Optional[Dict[str, Any]],
+                              rule_results: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge the per-method results into the analysis response"""
+        analysis_results = {
+            'analysis_type': 'Lightweight Medical AI Analysis',
+            'image_type': image_type,
+            'analysis_methods': [],
+            'conditions': [],
+            'recommendations': [],
+            'confidence_scores': {},
+            'model_insights': {}
+        }
+        
+        # Results are merged in a fixed order so ties rank the same whichever finishes first
+        # 1. Computer vision analysis
+        if cv_results:
+            analysis_results['analysis_methods'].append('computer_vision')
+            analysis_results['conditions'].extend(cv_results.get('conditions', []))
+            analysis_results['confidence_scores']['computer_vision'] = 70
+        
+        # 2. Transformer model analysis (if available)
+        if transformer_results:
+            analysis_results['analysis_methods'].append('transformer_model')
+            analysis_results['conditions'].extend(transformer_results.get('conditions', []))
+            analysis_results['confidence_scores']['transformer_model'] = 75
+        
+        # 3. Symptom analysis
+        if symptom_results:
+            analysis_results['analysis_methods'].append('symptom_analysis')
+            analysis_results['conditions'].extend(symptom_results.get('conditions', []))
+            analysis_results['confidence_scores']['symptom_analysis'] = 65
+        
+        # 4. Rule-based medical analysis
+        if rule_results:
+            analysis_results['analysis_methods'].append('medical_rules')
+            analysis_results['conditions'].extend(rule_results.get('conditions', []))
+            analysis_results['confidence_scores']['medical_rules'] = 60
+        
+        # Combine and rank results
+        analysis_results = self._combine_lite_results(analysis_results)
+        
+        return {
+            'success': True,
+            'analysis': analysis_results,
+            'lightweight_mode': True,
+            'available_models': self.available_models
+        }
+    
+    def _preprocess_image(self, image_data: bytes) -> Optional[np.ndarray]:
+        """Preprocess image for analysis (raw bytes, or a base64 string / data URL)"""
+        if isinstance(image_data, str):
+            return self._preprocess_data_uri(image_data)
+        return self._preprocess_bytes(image_data)
+    
+    def _preprocess_data_uri(self, image_data: str) -> Optional[np.ndarray]:
+        """Decode a base64 string, with or without a data-URL prefix, then preprocess it"""
+        try:
+            # rpartition leaves a bare base64 string whole, where partition would empty it
+            image_bytes = base64.b64decode(image_data.rpartition('base64,')[2], validate=False)
+        except Exception as e:
+            self.logger.error(f"Image preprocessing error: {e}")
+            return None
+        return self._preprocess_bytes(image_bytes)
+    
+    def _preprocess_bytes(self, image_data: bytes) -> Optional[np.ndarray]:
+        """Decode raw image bytes to an RGB array with the long side at most _MAX_ANALYSIS_SIDE"""
+        try:
+            # Large JPEGs are decoded at a reduced scale (IDCT scaling), then resized to the final size
+            if TURBOJPEG_AVAILABLE and image_data[:3] == _JPEG_MAGIC:
+                # JPEG straight to an RGB array in one libjpeg-turbo call
+                width, height, _, _ = _turbojpeg.decode_header(image_data)
+                image_array = _turbojpeg.decode(image_data, pixel_format=TJPF_RGB,
+                                                scaling_factor=(1, _jpeg_scale_denominator(width, height)))
+            else:
+                image = Image.open(io.BytesIO(image_data))
+                width, height = image.size
+                if max(width, height) > _MAX_ANALYSIS_SIDE:
+                    image.draft('RGB', _fit_within(width, height))  # no-op for non-JPEG images
+                
+                # Convert to RGB
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
                 
-                image_array = cv2.resize(image_array, (new_width, new_height))
+                # Convert to numpy array (asarray: no second copy of PIL's buffer; the analyzers only read it)
+                image_array = np.asarray(image)
+            
+            # Resize if too large (target computed from the original dimensions)
+            if max(width, height) > _MAX_ANALYSIS_SIDE:
+                new_size = _fit_within(width, height)
+                if (image_array.shape[1], image_array.shape[0]) != new_size:
+                    image_array = cv2.resize(image_array, new_size, interpolation=cv2.INTER_AREA)
             
             return image_array
             
@@ -240,16 +689,20 @@ class LightweightMedicalAI:
         try:
             conditions = []
             
-            # Basic color analysis
-            hsv_image = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+            # One grayscale conversion shared by the skin and chest checks; other types have no CV checks
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image_type in ('skin', 'chest', 'xray') else None
             
             if image_type == 'skin':
                 # Analyze skin conditions
                 
-                # Check for dark areas (potential melanoma)
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-                dark_threshold = np.mean(gray) - 1.5 * np.std(gray)
-                dark_percentage = (np.sum(gray < dark_threshold) / gray.size) * 100
+                # Check for dark areas (potential melanoma) - mean and std from one OpenCV pass
+                if NUMBA_AVAILABLE:
+                    _, _, dark_count = _dark_pixel_stats(gray, 1.5)
+                else:
+                    mean, std = cv2.meanStdDev(gray)
+                    dark_threshold = float(mean[0, 0]) - 1.5 * float(std[0, 0])
+                    dark_count = cv2.countNonZero(cv2.compare(gray, dark_threshold, cv2.CMP_LT))
+                dark_percentage = (dark_count / gray.size) * 100
                 
                 if dark_percentage > 8:
                     conditions.append({
@@ -259,9 +712,8 @@ class LightweightMedicalAI:
                         'description': 'Dark areas detected that may require evaluation'
                     })
                 
-                # Check for redness (inflammation)
-                red_channel = image[:, :, 0]
-                red_mean = np.mean(red_channel)
+                # Check for redness (inflammation) - channel means without slicing out a copy
+                red_mean = cv2.mean(image)[0]
                 if red_mean > 140:
                     conditions.append({
                         'name': 'Inflammatory condition possible',
@@ -270,9 +722,12 @@ class LightweightMedicalAI:
                         'description': 'Redness suggesting inflammatory condition'
                     })
                 
-                # Check for irregular borders
-                edges = cv2.Canny(gray, 50, 150)
-                edge_density = np.sum(edges > 0) / edges.size * 100
+                # Check for irregular borders - thresholded Sobel magnitude, rescaled to Canny's thin-edge density
+                grad_x = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3))
+                grad_y = cv2.convertScaleAbs(cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3))
+                magnitude = cv2.addWeighted(grad_x, 0.5, grad_y, 0.5, 0)
+                edge_pixels = cv2.countNonZero(cv2.compare(magnitude, _SOBEL_EDGE_THRESHOLD, cv2.CMP_GT))
+                edge_density = edge_pixels * _SOBEL_TO_CANNY_DENSITY / gray.size * 100
                 if edge_density > 15:
                     conditions.append({
                         'name': 'Irregular borders detected',
@@ -283,11 +738,10 @@ class LightweightMedicalAI:
             
             elif image_type in ['chest', 'xray']:
                 # Analyze chest X-rays
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-                
                 # Check for opacity/consolidation
-                mean_intensity = np.mean(gray)
-                std_intensity = np.std(gray)
+                mean, std = cv2.meanStdDev(gray)
+                mean_intensity = float(mean[0, 0])
+                std_intensity = float(std[0, 0])
                 
                 if std_intensity > 50:  # High variation might indicate pathology
                     conditions.append({
@@ -309,80 +763,88 @@ class LightweightMedicalAI:
     
     def _analyze_with_transformers(self, image: np.ndarray) -> Dict[str, Any]:
         """Analysis using transformer models"""
+        return self._analyze_images_with_transformers([image])[0]
+    
+    def _analyze_images_with_transformers(self, images: List[np.ndarray]) -> List[Dict[str, Any]]:
+        """Transformer analysis of several images in one batch; {} for each image if it fails"""
         try:
-            if not hasattr(self, 'image_classifier'):
-                return {}
-            
-            # Convert numpy array back to PIL for transformer
-            pil_image = Image.fromarray(image)
-            
-            # Get predictions
-            predictions = self.image_classifier(pil_image)
-            
-            conditions = []
-            for pred in predictions[:3]:  # Top 3 predictions
-                # Map generic predictions to medical conditions
-                confidence = pred['score'] * 100
-                label = pred['label'].lower()
+            # ONNX Runtime when its session builds; the PyTorch pipeline is then never loaded
+            session = _get_image_onnx_session()
+            if session is not None:
+                batch_predictions = _classify_images_onnx(session, images)
+            else:
+                image_classifier = _get_image_classifier()
+                if image_classifier is None:
+                    return [{} for _ in images]
                 
-                # Simple mapping to medical terms
-                if any(term in label for term in ['dark', 'spot', 'lesion']):
-                    conditions.append({
-                        'name': 'Possible lesion',
-                        'confidence': confidence,
-                        'source': 'transformer_model',
-                        'description': f'AI model detected: {pred["label"]}'
-                    })
-                elif confidence > 30:  # Include other high-confidence predictions
-                    conditions.append({
-                        'name': f'Visual finding: {pred["label"]}',
-                        'confidence': confidence,
-                        'source': 'transformer_model',
-                        'description': f'AI classification: {pred["label"]}'
-                    })
+                # Get predictions straight from the arrays (the pipeline itself needs a PIL round trip)
+                if TORCH_AVAILABLE:
+                    batch_predictions = _classify_images(image_classifier, images)
+                else:
+                    batch_predictions = image_classifier([Image.fromarray(image) for image in images])
             
-            return {
-                'success': True,
-                'conditions': conditions,
-                'method': 'transformer_model'
-            }
+            results = []
+            for predictions in batch_predictions:
+                conditions = []
+                for pred in predictions[:3]:  # Top 3 predictions
+                    # Map generic predictions to medical conditions
+                    confidence = pred['score'] * 100
+                    label = pred['label'].lower()
+                    
+                    # Simple mapping to medical terms
+                    if any(term in label for term in ['dark', 'spot', 'lesion']):
+                        conditions.append({
+                            'name': 'Possible lesion',
+                            'confidence': confidence,
+                            'source': 'transformer_model',
+                            'description': f'AI model detected: {pred["label"]}'
+                        })
+                    elif confidence > 30:  # Include other high-confidence predictions
+                        conditions.append({
+                            'name': f'Visual finding: {pred["label"]}',
+                            'confidence': confidence,
+                            'source': 'transformer_model',
+                            'description': f'AI classification: {pred["label"]}'
+                        })
+                
+                results.append({
+                    'success': True,
+                    'conditions': conditions,
+                    'method': 'transformer_model'
+                })
+            return results
             
         except Exception as e:
             self.logger.error(f"Transformer analysis error: {e}")
-            return {}
+            return [{} for _ in images]
     
-    def _analyze_symptoms_lite(self, symptoms: str, image_type: str) -> Dict[str, Any]:
-        """Lightweight symptom analysis"""
+    def _analyze_symptoms_lite(self, symptoms_lower: str, image_type: str) -> Dict[str, Any]:
+        """Lightweight symptom analysis (symptoms already lowercased)"""
         try:
-            symptoms_lower = symptoms.lower()
             conditions = []
             
             # Get relevant medical database
-            if image_type == 'skin':
-                medical_db = MEDICAL_CONDITIONS_DB['skin_conditions']
-            elif image_type in ['chest', 'xray']:
-                medical_db = MEDICAL_CONDITIONS_DB['chest_conditions']
+            if image_type in ['chest', 'xray']:
+                category = 'chest_conditions'
             else:
-                medical_db = MEDICAL_CONDITIONS_DB['skin_conditions']  # Default
+                category = 'skin_conditions'  # Skin, and the default
             
-            # Analyze symptoms against known conditions
-            for condition_name, condition_info in medical_db.items():
-                keyword_matches = 0
-                total_keywords = len(condition_info['keywords'])
-                
-                for keyword in condition_info['keywords']:
-                    if keyword in symptoms_lower:
-                        keyword_matches += 1
+            # Every condition's keywords found in one pass over the symptoms
+            keyword_hits = Counter(cond_id for cond_id, _ in _CONDITION_MATCHERS[category].matches(symptoms_lower))
+            
+            # Analyze symptoms against known conditions (in database order)
+            for cond_id in _CATEGORY_RANGES[category]:
+                keyword_matches = keyword_hits[cond_id]
                 
                 if keyword_matches > 0:
-                    confidence = min(90, (keyword_matches / total_keywords) * 100 + 30)
+                    confidence = min(90, (keyword_matches / _COND_KEYWORD_COUNTS[cond_id]) * 100 + 30)
                     conditions.append({
-                        'name': condition_name.replace('_', ' ').title(),
+                        'name': _COND_TITLES[cond_id],
                         'confidence': confidence,
                         'source': 'symptom_analysis',
-                        'description': condition_info['description'],
-                        'urgency': condition_info['urgency'],
-                        'specialist': condition_info['specialist']
+                        'description': _COND_DESCRIPTIONS[cond_id],
+                        'urgency': _COND_URGENCY[cond_id],
+                        'specialist': _COND_SPECIALIST[cond_id]
                     })
             
             return {
@@ -395,14 +857,15 @@ class LightweightMedicalAI:
             self.logger.error(f"Symptom analysis error: {e}")
             return {}
     
-    def _analyze_with_medical_rules(self, image_type: str, symptoms: str) -> Dict[str, Any]:
-        """Rule-based medical analysis"""
+    def _analyze_with_medical_rules(self, image_type: str, symptoms_lower: str) -> Dict[str, Any]:
+        """Rule-based medical analysis (symptoms already lowercased)"""
         try:
             conditions = []
+            rule_groups = _RULE_MATCHER.groups_in(symptoms_lower)
             
             # Basic rule-based analysis
             if image_type == 'skin':
-                if any(word in symptoms.lower() for word in ['mole', 'spot', 'lesion']):
+                if 'skin_lesion' in rule_groups:
                     conditions.append({
                         'name': 'Skin lesion evaluation needed',
                         'confidence': 60,
@@ -410,7 +873,7 @@ class LightweightMedicalAI:
                         'description': 'Skin lesion mentioned in symptoms'
                     })
                 
-                if any(word in symptoms.lower() for word in ['changing', 'growing', 'irregular']):
+                if 'skin_change' in rule_groups:
                     conditions.append({
                         'name': 'Concerning skin changes',
                         'confidence': 75,
@@ -419,7 +882,7 @@ class LightweightMedicalAI:
                     })
             
             elif image_type in ['chest', 'xray']:
-                if any(word in symptoms.lower() for word in ['cough', 'fever', 'breathing']):
+                if 'respiratory' in rule_groups:
                     conditions.append({
                         'name': 'Respiratory symptoms present',
                         'confidence': 70,
@@ -444,16 +907,14 @@ class LightweightMedicalAI:
             unique_conditions = {}
             for condition in analysis_results['conditions']:
                 name = condition.get('name', 'Unknown').lower()
-                confidence = condition.get('confidence', 0)
-                
-                if name not in unique_conditions or confidence > unique_conditions[name].get('confidence', 0):
+                kept = unique_conditions.setdefault(name, condition)
+                if kept is not condition and condition.get('confidence', 0) > kept.get('confidence', 0):
                     unique_conditions[name] = condition
             
-            analysis_results['conditions'] = sorted(
-                list(unique_conditions.values()),
-                key=lambda x: x.get('confidence', 0),
-                reverse=True
-            )[:5]  # Top 5 conditions
+            # Top 5 conditions (nlargest keeps sorted()'s order, ties included)
+            analysis_results['conditions'] = heapq.nlargest(
+                5, unique_conditions.values(), key=lambda x: x.get('confidence', 0)
+            )
             
             # Generate recommendations
             analysis_results['recommendations'] = self._generate_lite_recommendations(
@@ -554,11 +1015,13 @@ class LightweightMedicalAI:
             'summary': 'Basic analysis mode - professional medical evaluation recommended.'
         }
 
-# Global lightweight analyzer instance
-lightweight_medical_ai = LightweightMedicalAI()
+@functools.lru_cache(maxsize=1)
+def get_lightweight_medical_ai() -> LightweightMedicalAI:
+    """Shared lightweight analyzer, created on first use rather than at import"""
+    return LightweightMedicalAI()
 
 def analyze_with_lightweight_medical_ai(image_data: bytes, image_type: str = 'skin', 
-                                      symptoms: str = '') -> Dict[str, Any]:
+                                      symptoms: str = '', full_analysis: bool = False) -> Dict[str, Any]:
     """
     Convenience function for lightweight medical AI analysis
     
@@ -566,20 +1029,22 @@ def analyze_with_lightweight_medical_ai(image_data: bytes, image_type: str = 'sk
         image_data: Raw image bytes
         image_type: Type of medical image
         symptoms: Patient symptoms
+        full_analysis: Run every method, even when computer vision is already confident
         
     Returns:
         Lightweight analysis results
     """
-    return lightweight_medical_ai.analyze_medical_image_lite(image_data, image_type, symptoms)
+    return get_lightweight_medical_ai().analyze_medical_image_lite(image_data, image_type, symptoms, full_analysis)
 
 if __name__ == "__main__":
     print("🏥 Testing Lightweight Medical AI...")
     
     # Test initialization
+    lightweight_medical_ai = get_lightweight_medical_ai()
     available_models = lightweight_medical_ai.available_models
     print(f"Available models: {available_models}")
     
     # Test symptom analysis
     test_symptoms = "I have a dark mole that has been changing shape"
-    result = lightweight_medical_ai._analyze_symptoms_lite(test_symptoms, 'skin')
+    result = lightweight_medical_ai._analyze_symptoms_lite(test_symptoms.lower(), 'skin')
     print(f"Symptom analysis found {len(result.get('conditions', []))} conditions")
@@ -3,85 +3,112 @@
 Medical Image Analyzer using OpenAI Vision API
 AI-powered analysis of medical images including skin conditions, X-rays, and other medical imaging
 """
+import asyncio
 import io
-import base64
+import copy
+import functools
+import hashlib
+import importlib.util
+import json
 import logging
 import os
+import re
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from typing import Dict, List, Any, Optional
+import numpy as np
 from PIL import Image
-import openai
-from openai import OpenAI
+from src.ai.keyword_matcher import KeywordMatcher
 
-# Import the medical recommender for doctor suggestions
+# SIMD-accelerated base64 when available (same API as the stdlib module)
 try:
-    from src.llm.recommender import MedicalRecommender
-    MEDICAL_RECOMMENDER_AVAILABLE = True
+    import pybase64 as base64
 except ImportError:
-    MEDICAL_RECOMMENDER_AVAILABLE = False
-    print("Warning: MedicalRecommender not available for medical image analyzer")
+    import base64
+
+# Retries of a failed vision call after the first attempt
+_OPENAI_MAX_RETRIES = 3
+
+# Long side of the largest image sent to the vision API
+_MAX_API_IMAGE_SIDE = 1024
+
+# JPEG quality range for API uploads, picked per image from its gray-level entropy (bits):
+# flat images (X-rays, large uniform regions) hold up at the low end, detailed photos need the top
+_JPEG_QUALITY_MIN = 60
+_JPEG_QUALITY_MAX = 85
+
+# Zero-shot CLIP routing for uploads without a usable hint; open_clip (and torch) are optional and
+# imported on first use
+OPEN_CLIP_AVAILABLE = importlib.util.find_spec('open_clip') is not None
+_CATEGORY_TEXT_PROMPTS = (
+    ("skin", "a close-up photo of human skin"),
+    ("xray", "an x-ray, ct or mri scan"),
+    ("eye", "a close-up photo of a human eye"),
+    ("dental", "a photo of teeth and gums"),
+    ("wound", "a photo of a wound or injury"),
+    ("general", "a medical photo"),
+)
 
-class MedicalImageAnalyzer:
-    """
-    AI-powered medical image analyzer using OpenAI's Vision API
-    Supports various types of medical images including skin conditions, X-rays, and general medical photography
-    """
-    
-    def __init__(self):
-        """Initialize the medical image analyzer"""
-        self.logger = logging.getLogger(__name__)
-        
-        # Initialize OpenAI client
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        self.client = OpenAI(api_key=self.openai_api_key)
-        
-        # Medical image categories and their specific analysis prompts
-        self.medical_categories = {
-            "skin": {
-                "name": "Dermatological Analysis",
-                "specialist": "Dermatologist",
-                "prompt_template": self._get_dermatology_prompt()
-            },
-            "xray": {
-                "name": "Radiological Analysis", 
-                "specialist": "Radiologist",
-                "prompt_template": self._get_radiology_prompt()
-            },
-            "eye": {
-                "name": "Ophthalmological Analysis",
-                "specialist": "Ophthalmologist", 
-                "prompt_template": self._get_ophthalmology_prompt()
-            },
-            "dental": {
-                "name": "Dental Analysis",
-                "specialist": "Dentist",
-                "prompt_template": self._get_dental_prompt()
-            },
-            "wound": {
-                "name": "Wound Assessment",
-                "specialist": "General Practitioner",
-                "prompt_template": self._get_wound_assessment_prompt()
-            },
-            "general": {
-                "name": "General Medical Analysis",
-                "specialist": "General Practitioner",
-                "prompt_template": self._get_general_medical_prompt()
-            }
-        }
-        
-        # Initialize medical recommender if available
-        self.medical_recommender = None
-        if MEDICAL_RECOMMENDER_AVAILABLE:
-            try:
-                self.medical_recommender = MedicalRecommender()
-            except Exception as e:
-                self.logger.warning(f"Failed to initialize MedicalRecommender: {e}")
-    
-    def _get_dermatology_prompt(self) -> str:
-        """Get specialized prompt for dermatological analysis"""
-        return """You are an expert dermatologist AI assistant. Analyze this medical image focusing on skin conditions.
+
+@functools.lru_cache(maxsize=1)
+def _get_category_classifier():
+    """Process-wide (model, preprocess, normalized text embeddings) for CLIP routing; None if it cannot load"""
+    if not OPEN_CLIP_AVAILABLE:
+        return None
+    logger = logging.getLogger(__name__)
+    try:
+        import open_clip
+        import torch
+        model, _, preprocess = open_clip.create_model_and_transforms('ViT-B-32', pretrained='openai')
+        model.eval()
+        tokenizer = open_clip.get_tokenizer('ViT-B-32')
+        with torch.inference_mode():
+            text_features = model.encode_text(tokenizer([text for _, text in _CATEGORY_TEXT_PROMPTS]))
+            text_features /= text_features.norm(dim=-1, keepdim=True)
+        logger.info("✅ CLIP image category classifier loaded")
+        return model, preprocess, text_features
+    except Exception as e:
+        logger.warning("Failed to load CLIP category classifier: %s", e)
+        return None
+
+
+def _classify_image_category(image: Image.Image) -> Optional[str]:
+    """Category whose text prompt is closest to the image in CLIP space, or None without CLIP"""
+    classifier = _get_category_classifier()
+    if classifier is None:
+        return None
+    import torch
+    model, preprocess, text_features = classifier
+    with torch.inference_mode():
+        image_features = model.encode_image(preprocess(image).unsqueeze(0))
+        image_features /= image_features.norm(dim=-1, keepdim=True)
+        best = int((image_features @ text_features.T).argmax())
+    return _CATEGORY_TEXT_PROMPTS[best][0]
+
+
+# Formatted doctor tables kept for repeated (doctor names, specialist) lookups
+_DOCTORS_HTML_CACHE_SIZE = 64
+
+# Vision results are reused only for the exact same image of the same category, within the
+# time-to-live; a merely similar photo (possibly another user's) always gets its own analysis
+_VISION_CACHE_SIZE = 256
+_VISION_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def _image_content_digest(image: Image.Image) -> bytes:
+    """Digest of an image's decoded pixels, mode and size"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.digest()
+
+
+# Specialized analysis prompts, one per medical image category
+_DERMATOLOGY_PROMPT = """You are an expert dermatologist AI assistant. Analyze this medical image focusing on skin conditions.
 
 Please provide a detailed analysis including:
 
@@ -107,9 +134,7 @@ Remember: This is for educational purposes only and does not replace professiona
 
 Format your response in clear sections with appropriate medical terminology but explain complex terms."""
 
-    def _get_radiology_prompt(self) -> str:
-        """Get specialized prompt for radiological analysis"""
-        return """You are an expert radiologist AI assistant. Analyze this medical imaging study (X-ray, CT, MRI, etc.).
+_RADIOLOGY_PROMPT = """You are an expert radiologist AI assistant. Analyze this medical imaging study (X-ray, CT, MRI, etc.).
 
 Please provide a detailed analysis including:
 
@@ -142,9 +167,7 @@ Please provide a detailed analysis including:
 
 IMPORTANT: This is for educational purposes only. Radiological interpretation requires extensive training and should always be performed by qualified radiologists. Emphasize the need for professional interpretation."""
 
-    def _get_ophthalmology_prompt(self) -> str:
-        """Get specialized prompt for eye/ophthalmological analysis"""
-        return """You are an expert ophthalmologist AI assistant. Analyze this eye-related medical image.
+_OPHTHALMOLOGY_PROMPT = """You are an expert ophthalmologist AI assistant. Analyze this eye-related medical image.
 
 Please provide a detailed analysis including:
 
@@ -169,9 +192,7 @@ Please provide a detailed analysis including:
 
 Remember: Eye conditions can be serious and vision-threatening. Always emphasize the importance of professional evaluation by an ophthalmologist."""
 
-    def _get_dental_prompt(self) -> str:
-        """Get specialized prompt for dental analysis"""
-        return """You are an expert dental AI assistant. Analyze this dental/oral health image.
+_DENTAL_PROMPT = """You are an expert dental AI assistant. Analyze this dental/oral health image.
 
 Please provide a detailed analysis including:
 
@@ -194,9 +215,7 @@ Please provide a detailed analysis including:
 
 Note: This analysis is for educational purposes. Professional dental examination is essential for proper diagnosis and treatment planning."""
 
-    def _get_wound_assessment_prompt(self) -> str:
-        """Get specialized prompt for wound assessment"""
-        return """You are an expert in wound care assessment. Analyze this wound or injury image.
+_WOUND_ASSESSMENT_PROMPT = """You are an expert in wound care assessment. Analyze this wound or injury image.
 
 Please provide a detailed analysis including:
 
@@ -222,9 +241,7 @@ Please provide a detailed analysis including:
 
 Important: Wound care can be complex. Serious wounds, signs of infection, or non-healing wounds require professional medical evaluation."""
 
-    def _get_general_medical_prompt(self) -> str:
-        """Get general medical analysis prompt"""
-        return """You are an expert medical AI assistant. Analyze this medical image comprehensively.
+_GENERAL_MEDICAL_PROMPT = """You are an expert medical AI assistant. Analyze this medical image comprehensively.
 
 Please provide a detailed analysis including:
 
@@ -249,6 +266,190 @@ Please provide a detailed analysis including:
 
 Remember: This is for educational and informational purposes only. Medical images require professional interpretation by qualified healthcare providers. Always recommend appropriate medical consultation."""
 
+# User hint words per image category, in priority order (the first category hit wins)
+_HINT_CATEGORY_KEYWORDS = {
+    "skin": ('skin', 'rash', 'mole', 'acne', 'dermatitis'),
+    "xray": ('xray', 'x-ray', 'ct', 'mri', 'scan'),
+    "eye": ('eye', 'vision', 'pupil', 'ophth'),
+    "dental": ('dental', 'tooth', 'teeth', 'gum', 'oral'),
+    "wound": ('wound', 'cut', 'injury', 'burn'),
+}
+_HINT_MATCHER = KeywordMatcher(_HINT_CATEGORY_KEYWORDS)
+
+# Specialist mentions in the vision analysis; the specialist with the most distinct keywords wins,
+# ties going to the earlier entry
+_SPECIALIST_KEYWORDS = {
+    'orthopedist': ('orthopedist', 'orthopedic', 'bone fracture', 'broken bone', 'joint injury', 'musculoskeletal'),
+    'cardiologist': ('cardiologist', 'heart', 'cardiac', 'cardiovascular'),
+    'pulmonologist': ('pulmonologist', 'lung', 'respiratory', 'chest', 'breathing'),
+    'neurologist': ('neurologist', 'brain', 'neurological', 'head injury', 'concussion'),
+    'dermatologist': ('dermatologist', 'skin', 'rash', 'lesion', 'mole'),
+    'ophthalmologist': ('ophthalmologist', 'eye', 'vision', 'retina', 'pupil'),
+    'dentist': ('dentist', 'dental', 'tooth', 'teeth', 'oral'),
+    'gastroenterologist': ('gastroenterologist', 'abdominal', 'stomach', 'intestinal'),
+    'urologist': ('urologist', 'kidney', 'bladder', 'urinary'),
+}
+_SPECIALIST_MATCHER = KeywordMatcher(_SPECIALIST_KEYWORDS)
+
+
+# Specialist types mapped to the doctor database's specialty names
+_SPECIALIST_DB_NAMES = MappingProxyType({
+    'Dermatologist': 'dermatologist',
+    'Radiologist': 'radiologist',
+    'Ophthalmologist': 'ophthalmologist', 
+    'Dentist': 'dentist',
+    'General Practitioner': 'general-physician',
+    'Orthopedist': 'orthopedist',
+    'Cardiologist': 'cardiologist',
+    'Neurologist': 'neurologist',
+    'Pulmonologist': 'pulmonologist',
+    'Gastroenterologist': 'gastroenterologist',
+    'Urologist': 'urologist',
+    'Gynecologist': 'gynecologist',
+    'Pediatrician': 'pediatrician',
+    'Psychiatrist': 'psychiatrist',
+    'Endocrinologist': 'endocrinologist',
+    'Rheumatologist': 'rheumatologist'
+})
+
+# Appended to every category prompt: the model names the specialist itself instead of it being
+# recovered from the free-form analysis afterwards
+# Short fields first, so a reply cut off at the token limit still carries them
+_JSON_RESPONSE_KEYS = (
+    f'"specialist_type" (one of {"|".join(_SPECIALIST_DB_NAMES)}), '
+    '"urgency" (one of low|medium|high), '
+    '"analysis" (your full analysis as a markdown string, following the sections above)'
+)
+_JSON_RESPONSE_INSTRUCTION = f"\n\nRespond as a JSON object with exactly these keys, in this order: {_JSON_RESPONSE_KEYS}."
+# Several images under one prompt; JSON mode only returns objects, so the per-image array sits under "results"
+_BATCH_JSON_RESPONSE_INSTRUCTION = (
+    "\n\nYou are given {count} images. Analyze each image separately, in the order they appear. "
+    'Respond as a JSON object with one key, "results": an array of exactly {count} objects in image order, '
+    f"each with exactly these keys, in this order: {_JSON_RESPONSE_KEYS}."
+)
+_URGENCY_LEVELS = frozenset(('low', 'medium', 'high'))
+
+# Completion budget per analyzed image; the prompts ask for a full multi-section report
+_VISION_MAX_TOKENS = 1500
+
+# String fields of a vision reply, including one left unterminated by a truncated completion
+_JSON_STRING_FIELD = re.compile(r'"(specialist_type|urgency|analysis)"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+
+
+def _truncated_json_fields(content: str) -> Dict[str, str]:
+    """Fields recoverable from a JSON reply cut off mid-way; the last, unterminated string is kept up to the cut"""
+    fields = {}
+    for match in _JSON_STRING_FIELD.finditer(content or ''):
+        key, raw = match.groups()
+        if key in fields:
+            continue
+        # Drop a trailing partial escape (at most '\\uXXX') until the string decodes
+        for cut in range(min(6, len(raw)) + 1):
+            try:
+                fields[key] = json.loads('"' + raw[:len(raw) - cut] + '"')
+                break
+            except ValueError:
+                continue
+    return fields
+
+
+@functools.lru_cache(maxsize=1)
+def _get_image_executor() -> ThreadPoolExecutor:
+    """Process-wide worker pool for PIL decode/resize/encode in the async path"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix='medical-image')
+
+
+async def _run_image_work(func, *args):
+    """Run CPU-bound image work on the image pool so the event loop keeps serving other requests"""
+    return await asyncio.get_running_loop().run_in_executor(_get_image_executor(), func, *args)
+
+
+class MedicalImageAnalyzer:
+    """
+    AI-powered medical image analyzer using OpenAI's Vision API
+    Supports various types of medical images including skin conditions, X-rays, and general medical photography
+    """
+    
+    def __init__(self):
+        """Initialize the medical image analyzer"""
+        self.logger = logging.getLogger(__name__)
+        
+        # Initialize OpenAI client
+        self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        if not self.openai_api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        
+        # openai is the bulk of this module's import time; load it with the first analyzer
+        from openai import OpenAI, AsyncOpenAI
+
+        # Transient failures (429, 5xx, timeouts, dropped connections) are retried by the client with
+        # jittered exponential backoff, honoring Retry-After, resending the already-encoded request
+        self.client = OpenAI(api_key=self.openai_api_key, max_retries=_OPENAI_MAX_RETRIES)
+        self.async_client = AsyncOpenAI(api_key=self.openai_api_key, max_retries=_OPENAI_MAX_RETRIES)
+        
+        # Medical image categories and their specific analysis prompts; detail_level is the vision
+        # budget ("low": one 512px tile, "high": 512px tiles of a 1024px image) - high only where fine detail matters
+        self.medical_categories = {
+            "skin": {
+                "name": "Dermatological Analysis",
+                "specialist": "Dermatologist",
+                "prompt_template": _DERMATOLOGY_PROMPT,
+                "detail_level": "low"
+            },
+            "xray": {
+                "name": "Radiological Analysis", 
+                "specialist": "Radiologist",
+                "prompt_template": _RADIOLOGY_PROMPT,
+                "detail_level": "high"
+            },
+            "eye": {
+                "name": "Ophthalmological Analysis",
+                "specialist": "Ophthalmologist", 
+                "prompt_template": _OPHTHALMOLOGY_PROMPT,
+                "detail_level": "high"
+            },
+            "dental": {
+                "name": "Dental Analysis",
+                "specialist": "Dentist",
+                "prompt_template": _DENTAL_PROMPT,
+                "detail_level": "low"
+            },
+            "wound": {
+                "name": "Wound Assessment",
+                "specialist": "General Practitioner",
+                "prompt_template": _WOUND_ASSESSMENT_PROMPT,
+                "detail_level": "low"
+            },
+            "general": {
+                "name": "General Medical Analysis",
+                "specialist": "General Practitioner",
+                "prompt_template": _GENERAL_MEDICAL_PROMPT,
+                "detail_level": "low"
+            }
+        }
+        
+        # Bounded LRU of successful vision results keyed by (category, prompt, perceptual hash);
+        # values are (stored_at, result) and a hit hands out a fresh copy
+        self._vision_cache: OrderedDict = OrderedDict()
+        # The shared analyzer serves concurrent requests; lookups and evictions must not interleave
+        self._vision_cache_lock = threading.Lock()
+        
+        # Base64 JPEGs of live PIL images keyed by (id(image), max_size); values hold a weakref to
+        # the image, so an entry is dropped with its image and a reused id never matches
+        self._encoded_cache: Dict[tuple, tuple] = {}
+        self._doctors_html_cache: OrderedDict = OrderedDict()
+        
+        # Initialize medical recommender if available; imported here so that
+        # importing this module does not pull in the recommender stack
+        self.medical_recommender = None
+        try:
+            from src.llm.recommender import MedicalRecommender
+            self.medical_recommender = MedicalRecommender()
+        except ImportError:
+            self.logger.warning("MedicalRecommender not available for medical image analyzer")
+        except Exception as e:
+            self.logger.warning("Failed to initialize MedicalRecommender: %s", e)
+    
     def validate_image(self, image_data: bytes) -> Dict[str, Any]:
         """
         Validate uploaded medical image
@@ -285,10 +486,12 @@ Remember: This is for educational and informational purposes only. Medical image
                     "error": "Image too small. Minimum size is 50x50 pixels."
                 }
             
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            # JPEGs are decoded at a reduced scale (libjpeg IDCT scaling) that still covers the largest
+            # size sent to the API, instead of at full resolution; draft is a no-op for other formats
+            image.draft('RGB', (_MAX_API_IMAGE_SIDE, _MAX_API_IMAGE_SIDE))
             
+            # Left in its decoded mode: encode_image_for_api converts after downscaling, so a
+            # full-resolution pixel copy is never made just to change the mode
             return {
                 "valid": True,
                 "image": image,
@@ -313,46 +516,78 @@ Remember: This is for educational and informational purposes only. Medical image
         Returns:
             Category key for specialized analysis
         """
-        # If user provides a hint, try to match it
+        # If user provides a hint, try to match it (every category's words found in one pass)
         if user_hint:
-            hint_lower = user_hint.lower()
-            if any(word in hint_lower for word in ['skin', 'rash', 'mole', 'acne', 'dermatitis']):
-                return "skin"
-            elif any(word in hint_lower for word in ['xray', 'x-ray', 'ct', 'mri', 'scan']):
-                return "xray"
-            elif any(word in hint_lower for word in ['eye', 'vision', 'pupil', 'ophth']):
-                return "eye"
-            elif any(word in hint_lower for word in ['dental', 'tooth', 'teeth', 'gum', 'oral']):
-                return "dental"
-            elif any(word in hint_lower for word in ['wound', 'cut', 'injury', 'burn']):
-                return "wound"
+            hinted = _HINT_MATCHER.groups_in(user_hint.lower())
+            for category in _HINT_CATEGORY_KEYWORDS:
+                if category in hinted:
+                    return category
+        
+        # No usable hint: zero-shot CLIP on the image, when installed
+        if image is not None:
+            try:
+                category = _classify_image_category(image)
+                if category is not None:
+                    return category
+            except Exception as e:
+                self.logger.warning("CLIP category detection failed: %s", e)
         
         # Default to general medical analysis
         return "general"
     
-    def encode_image_for_api(self, image: Image.Image) -> str:
+    def encode_image_for_api(self, image: Image.Image, detail: str = "high", grayscale: bool = False) -> str:
         """
         Encode image for OpenAI API
         
         Args:
             image: PIL Image object
+            detail: Vision detail level the image is sent with ("low" or "high")
+            grayscale: Send a single-channel JPEG (X-rays carry no color)
             
         Returns:
             Base64 encoded image string
         """
-        # Resize image if too large to reduce API costs
-        max_size = 1024
+        # Resize image if too large to reduce API costs (low detail never looks past 512px)
+        max_size = 512 if detail == "low" else _MAX_API_IMAGE_SIDE
+        
+        # The same image object encoded at this size already (retries, repeated analyses)
+        cache_key = (id(image), max_size, grayscale)
+        cached = self._encoded_cache.get(cache_key)
+        if cached is not None and cached[0]() is image:
+            return cached[1]
+        source = image
+        
+        # Palette and bilevel images only resize with nearest-neighbour; expand them first
+        if image.mode in ('P', '1'):
+            image = image.convert('RGB')
+        
         if max(image.size) > max_size:
             ratio = max_size / max(image.size)
             new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+            # Bilinear: the vision encoder downsamples again, so Lanczos' extra sharpness is not seen
+            image = image.resize(new_size, Image.Resampling.BILINEAR)
+        
+        gray = image if image.mode == 'L' else image.convert('L')
+        if grayscale:
+            image = gray
+        quality = int(np.clip(50 + 7 * gray.entropy(), _JPEG_QUALITY_MIN, _JPEG_QUALITY_MAX))
         
-        # Convert to base64
+        # Convert to base64 straight from the buffer's memory (no intermediate bytes copy)
         img_buffer = io.BytesIO()
-        image.save(img_buffer, format='JPEG', quality=85)
-        img_buffer.seek(0)
+        # Baseline JPEG without Huffman optimization: the bytes go straight into the request
+        if grayscale:
+            image.save(img_buffer, format='JPEG', quality=quality, optimize=False, progressive=False)
+        else:
+            # Any mode conversion happens here, on the already-downscaled pixels
+            (image if image.mode == 'RGB' else image.convert('RGB')).save(
+                img_buffer, format='JPEG', quality=quality, optimize=False, progressive=False, subsampling=2)
+        
+        encoded = base64.b64encode(img_buffer.getbuffer()).decode('ascii')
         
-        return base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+        # Entries live only as long as their image: the weakref callback drops them when it is collected
+        cache = self._encoded_cache
+        cache[cache_key] = (weakref.ref(source, lambda _, key=cache_key: cache.pop(key, None)), encoded)
+        return encoded
     
     def extract_specialist_from_analysis(self, analysis_text: str, default_specialist: str) -> str:
         """
@@ -367,33 +602,21 @@ Remember: This is for educational and informational purposes only. Medical image
         """
         analysis_lower = analysis_text.lower()
         
-        # Look for specific specialist mentions in the analysis
-        specialist_keywords = {
-            'orthopedist': ['orthopedist', 'orthopedic', 'bone fracture', 'broken bone', 'joint injury', 'musculoskeletal'],
-            'cardiologist': ['cardiologist', 'heart', 'cardiac', 'cardiovascular'],
-            'pulmonologist': ['pulmonologist', 'lung', 'respiratory', 'chest', 'breathing'],
-            'neurologist': ['neurologist', 'brain', 'neurological', 'head injury', 'concussion'],
-            'dermatologist': ['dermatologist', 'skin', 'rash', 'lesion', 'mole'],
-            'ophthalmologist': ['ophthalmologist', 'eye', 'vision', 'retina', 'pupil'],
-            'dentist': ['dentist', 'dental', 'tooth', 'teeth', 'oral'],
-            'gastroenterologist': ['gastroenterologist', 'abdominal', 'stomach', 'intestinal'],
-            'urologist': ['urologist', 'kidney', 'bladder', 'urinary'],
-        }
+        # Count keyword matches for each specialist - one pass over the analysis for all of them
+        hits = Counter(specialist for specialist, _ in _SPECIALIST_MATCHER.matches(analysis_lower))
         
-        # Count keyword matches for each specialist
-        specialist_scores = {}
-        for specialist, keywords in specialist_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in analysis_lower)
-            if score > 0:
-                specialist_scores[specialist] = score
+        # Highest score in one pass, in table order so ties go to the earlier specialist
+        best_specialist, best_score = default_specialist, 0
+        for specialist in _SPECIALIST_KEYWORDS:
+            score = hits[specialist]
+            if score > best_score:
+                best_specialist, best_score = specialist, score
         
-        # Return the specialist with the highest score
-        if specialist_scores:
-            recommended_specialist = max(specialist_scores, key=specialist_scores.get)
-            print(f"🧠 AI Analysis detected specialist: {recommended_specialist} (score: {specialist_scores[recommended_specialist]})")
-            return recommended_specialist.title()
+        if best_score:
+            self.logger.debug("AI analysis detected specialist: %s (score: %d)", best_specialist, best_score)
+            return best_specialist.title()
         
-        print(f"🧠 AI Analysis: No specific specialist detected, using default: {default_specialist}")
+        self.logger.debug("AI analysis: no specific specialist detected, using default: %s", default_specialist)
         return default_specialist
 
     def analyze_with_openai_vision(self, image: Image.Image, category: str) -> Dict[str, Any]:
@@ -410,57 +633,220 @@ Remember: This is for educational and informational purposes only. Medical image
         try:
             # Get the appropriate prompt for the medical category
             category_info = self.medical_categories.get(category, self.medical_categories["general"])
-            prompt = category_info["prompt_template"]
             
-            # Encode image for API
-            base64_image = self.encode_image_for_api(image)
+            # Same or near-duplicate image analyzed recently: no API call
+            cache_key = self._vision_cache_key(image, category, category_info)
+            cached = self._lookup_vision_cache(cache_key)
+            if cached is not None:
+                self.logger.info("Vision cache hit for %s image", category)
+                return cached
             
             # Call OpenAI Vision API
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # Updated to current vision model
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}",
-                                    "detail": "high"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=1500,
-                temperature=0.3  # Lower temperature for more consistent medical analysis
-            )
-            
-            analysis_text = response.choices[0].message.content
-            default_specialist = category_info["specialist"]
-            
-            # Extract specialist recommendation from analysis
-            recommended_specialist = self.extract_specialist_from_analysis(analysis_text, default_specialist)
+            response = self.client.chat.completions.create(**self._build_vision_request(image, category, category_info))
+            return self._vision_result(response, category_info, cache_key)
             
+        except Exception as e:
+            self.logger.error("OpenAI Vision API error: %s", e)
             return {
-                "success": True,
-                "analysis_text": analysis_text,
-                "category": category_info["name"],
-                "specialist_type": recommended_specialist,
-                "model_used": "gpt-4o"
+                "success": False,
+                "error": f"AI analysis failed: {str(e)}"
             }
+    
+    async def analyze_with_openai_vision_async(self, image: Image.Image, category: str) -> Dict[str, Any]:
+        """
+        Awaitable mirror of analyze_with_openai_vision
+        Purpose: Lets many in-flight vision calls share one event loop instead of a blocked thread each
+        """
+        try:
+            category_info = self.medical_categories.get(category, self.medical_categories["general"])
+            
+            # Hashing and JPEG encoding decode the full image: both run off the event loop
+            cache_key = await _run_image_work(self._vision_cache_key, image, category, category_info)
+            cached = self._lookup_vision_cache(cache_key)
+            if cached is not None:
+                self.logger.info("Vision cache hit for %s image", category)
+                return cached
+            
+            request = await _run_image_work(self._build_vision_request, image, category, category_info)
+            response = await self.async_client.chat.completions.create(**request)
+            return self._vision_result(response, category_info, cache_key)
             
         except Exception as e:
-            self.logger.error(f"OpenAI Vision API error: {e}")
+            self.logger.error("Async OpenAI Vision API error: %s", e)
             return {
                 "success": False,
                 "error": f"AI analysis failed: {str(e)}"
             }
     
+    def _vision_cache_key(self, image: Image.Image, category: str, category_info: Dict[str, Any]) -> tuple:
+        """Key of an image's entry in the vision cache: category, prompt and exact content digest"""
+        return category, hash(category_info["prompt_template"]), _image_content_digest(image)
+    
+    def _build_vision_request(self, image: Image.Image, category: str, category_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the chat.completions keyword arguments shared by the sync and async paths"""
+        self.logger.info("Vision request for %s image: detail=%s", category, category_info['detail_level'])
+        return self._vision_request_kwargs(
+            category_info["prompt_template"] + _JSON_RESPONSE_INSTRUCTION,
+            [self._vision_image_block(image, category, category_info)],
+            _VISION_MAX_TOKENS
+        )
+    
+    def _build_batch_vision_request(self, images: List[Image.Image], category: str, category_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build one chat.completions request that analyzes several images of a category under a single prompt"""
+        self.logger.info("Vision request for %d %s images: detail=%s", len(images), category, category_info['detail_level'])
+        return self._vision_request_kwargs(
+            category_info["prompt_template"] + _BATCH_JSON_RESPONSE_INSTRUCTION.format(count=len(images)),
+            [self._vision_image_block(image, category, category_info) for image in images],
+            _VISION_MAX_TOKENS * len(images)
+        )
+    
+    def _vision_image_block(self, image: Image.Image, category: str, category_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Image content block, encoded at the category's vision budget"""
+        detail = category_info["detail_level"]
+        base64_image = self.encode_image_for_api(image, detail, grayscale=category == "xray")
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{base64_image}",
+                "detail": detail
+            }
+        }
+    
+    def _vision_request_kwargs(self, prompt: str, image_blocks: List[Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+        """chat.completions keyword arguments for a prompt followed by image blocks"""
+        return {
+            'model': "gpt-4o",  # Updated to current vision model
+            'messages': [
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": prompt}, *image_blocks]
+                }
+            ],
+            'response_format': {"type": "json_object"},
+            'max_tokens': max_tokens,
+            'temperature': 0.3  # Lower temperature for more consistent medical analysis
+        }
+    
+    def _vision_result(self, response, category_info: Dict[str, Any], cache_key: tuple) -> Dict[str, Any]:
+        """Turn a chat completion into the analysis result and cache it"""
+        choice = response.choices[0]
+        content = choice.message.content
+        truncated = getattr(choice, 'finish_reason', None) == "length"
+        
+        if truncated:
+            # Cut off at max_tokens: keep the analysis written so far rather than the raw, unclosed JSON
+            self.logger.warning("Vision reply hit the token limit; using the truncated analysis")
+            parsed = _truncated_json_fields(content)
+        else:
+            try:
+                parsed = json.loads(content)
+            except (TypeError, ValueError):
+                parsed = None
+            if not isinstance(parsed, dict):
+                parsed = {"analysis": content}
+        
+        result = self._parsed_vision_result(parsed, "" if truncated else content, category_info)
+        # A truncated analysis is not cached, so the next request for this image gets a complete one
+        if not truncated:
+            self._store_vision_cache(cache_key, result)
+        return result
+    
+    def _parsed_vision_result(self, parsed: Dict[str, Any], content: str, category_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Analysis result from one image's decoded JSON answer; content is the raw text used when "analysis" is missing"""
+        default_specialist = category_info["specialist"]
+        analysis_text = parsed.get("analysis")
+        if not isinstance(analysis_text, str):
+            analysis_text = content
+        
+        # The model's own specialist pick; only malformed or out-of-list answers fall back to the keyword scan
+        recommended_specialist = parsed.get("specialist_type")
+        if recommended_specialist not in _SPECIALIST_DB_NAMES:
+            recommended_specialist = self.extract_specialist_from_analysis(analysis_text, default_specialist)
+        urgency = parsed.get("urgency")
+        
+        return {
+            "success": True,
+            "analysis_text": analysis_text,
+            "category": category_info["name"],
+            "specialist_type": recommended_specialist,
+            "urgency": urgency if urgency in _URGENCY_LEVELS else None,
+            "model_used": "gpt-4o"
+        }
+    
+    def analyze_batch_with_openai_vision(self, images: List[Image.Image], category: str) -> List[Dict[str, Any]]:
+        """
+        Analyze several images of one category with a single OpenAI Vision call
+        Purpose: The prompt is sent and processed once for all images instead of once per image
+        
+        Args:
+            images: PIL Image objects
+            category: Medical image category shared by all images
+            
+        Returns:
+            One analysis result per image, in order
+        """
+        category_info = self.medical_categories.get(category, self.medical_categories["general"])
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        
+        # Only images without a cached analysis go into the request
+        pending = []
+        for index, image in enumerate(images):
+            cache_key = self._vision_cache_key(image, category, category_info)
+            cached = self._lookup_vision_cache(cache_key)
+            if cached is not None:
+                self.logger.info("Vision cache hit for %s image", category)
+                results[index] = cached
+            else:
+                pending.append((index, image, cache_key))
+        
+        if len(pending) > 1:
+            try:
+                request = self._build_batch_vision_request([image for _, image, _ in pending], category, category_info)
+                response = self.client.chat.completions.create(**request)
+                if getattr(response.choices[0], 'finish_reason', None) == "length":
+                    # A cut-off array cannot be lined up with the images; analyze them one by one
+                    self.logger.warning("Vision batch reply hit the token limit; analyzing images separately")
+                    answers = None
+                else:
+                    answers = json.loads(response.choices[0].message.content).get("results")
+            except Exception as e:
+                self.logger.error("OpenAI Vision batch API error: %s", e)
+                answers = None
+            
+            if isinstance(answers, list) and len(answers) == len(pending):
+                for (index, _, cache_key), answer in zip(pending, answers):
+                    if isinstance(answer, dict) and isinstance(answer.get("analysis"), str):
+                        results[index] = self._parsed_vision_result(answer, answer["analysis"], category_info)
+                        self._store_vision_cache(cache_key, results[index])
+        
+        # A single image, or answers the batch reply did not line up with, go through the one-image call
+        for index, image, _ in pending:
+            if results[index] is None:
+                results[index] = self.analyze_with_openai_vision(image, category)
+        return results
+    
+    def _lookup_vision_cache(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        """Cached vision result for this key, if stored within the time-to-live"""
+        with self._vision_cache_lock:
+            entry = self._vision_cache.get(cache_key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if time.monotonic() - stored_at >= _VISION_CACHE_TTL_SECONDS:
+                del self._vision_cache[cache_key]
+                return None
+            self._vision_cache.move_to_end(cache_key)
+        return copy.deepcopy(result)
+    
+    def _store_vision_cache(self, cache_key: tuple, result: Dict[str, Any]):
+        """Remember a successful vision result, evicting the least recently used entry beyond _VISION_CACHE_SIZE"""
+        entry = (time.monotonic(), copy.deepcopy(result))
+        with self._vision_cache_lock:
+            self._vision_cache[cache_key] = entry
+            self._vision_cache.move_to_end(cache_key)
+            if len(self._vision_cache) > _VISION_CACHE_SIZE:
+                self._vision_cache.popitem(last=False)
+    
     def get_doctor_recommendations(self, specialist_type: str, user_city: str = None, sort_by: str = "rating", user_location: dict = None) -> List[Dict[str, Any]]:
         """
         Get doctor recommendations for the specialist type with sorting options
@@ -477,28 +863,8 @@ Remember: This is for educational and informational purposes only. Medical image
             return []
         
         try:
-            # Map specialist types to database-friendly names
-            specialist_map = {
-                'Dermatologist': 'dermatologist',
-                'Radiologist': 'radiologist',
-                'Ophthalmologist': 'ophthalmologist', 
-                'Dentist': 'dentist',
-                'General Practitioner': 'general-physician',
-                'Orthopedist': 'orthopedist',
-                'Cardiologist': 'cardiologist',
-                'Neurologist': 'neurologist',
-                'Pulmonologist': 'pulmonologist',
-                'Gastroenterologist': 'gastroenterologist',
-                'Urologist': 'urologist',
-                'Gynecologist': 'gynecologist',
-                'Pediatrician': 'pediatrician',
-                'Psychiatrist': 'psychiatrist',
-                'Endocrinologist': 'endocrinologist',
-                'Rheumatologist': 'rheumatologist'
-            }
-            
-            db_specialist = specialist_map.get(specialist_type, 'general-physician')
-            print(f"🔍 Getting doctors for specialist: {specialist_type} -> {db_specialist}")
+            db_specialist = _SPECIALIST_DB_NAMES.get(specialist_type, 'general-physician')
+            self.logger.debug("Getting doctors for specialist: %s -> %s", specialist_type, db_specialist)
             
             # Get doctor recommendations directly from the doctor_recommender
             user_lat = None
@@ -516,14 +882,14 @@ Remember: This is for educational and informational purposes only. Medical image
                 user_lng=user_lng
             )
             
-            print(f"📋 Raw doctor recommendations received: {len(doctor_recommendations)} doctors")
+            self.logger.debug("Raw doctor recommendations received: %d doctors", len(doctor_recommendations))
             
             # Return the doctors directly (they're already in the correct format)
             if doctor_recommendations:
-                print(f"✅ Found {len(doctor_recommendations)} real doctors")
+                self.logger.debug("Found %d real doctors", len(doctor_recommendations))
                 return doctor_recommendations
             else:
-                print("⚠️ No doctors found, creating sample doctors")
+                self.logger.debug("No doctors found, creating sample doctors")
                 sample_doctors = [
                     {
                         "name": f"Dr. Sample {specialist_type} 1",
@@ -562,10 +928,11 @@ Remember: This is for educational and informational purposes only. Medical image
                 return sample_doctors
             
         except Exception as e:
-            self.logger.error(f"Error getting doctor recommendations: {e}")
+            self.logger.error("Error getting doctor recommendations: %s", e)
             return []
     
-    def analyze_medical_image(self, image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None) -> Dict[str, Any]:
+    def analyze_medical_image(self, image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None,
+                              include_html: bool = False) -> Dict[str, Any]:
         """
         Main method to analyze medical image using OpenAI Vision API
         
@@ -574,6 +941,7 @@ Remember: This is for educational and informational purposes only. Medical image
             image_type: Optional hint about image type (skin, xray, eye, dental, wound, general)
             user_city: Optional user city for doctor recommendations
             user_location: Optional user location dict with latitude/longitude
+            include_html: Also return the doctors pre-formatted as an HTML table (doctors_html)
             
         Returns:
             Analysis results with AI interpretation, specialist recommendations, and doctors
@@ -598,51 +966,163 @@ Remember: This is for educational and informational purposes only. Medical image
             if not ai_analysis["success"]:
                 return ai_analysis
             
-            # Get doctor recommendations with default sorting and location
-            specialist_type = ai_analysis["specialist_type"]
-            doctors = self.get_doctor_recommendations(specialist_type, user_city, "rating", user_location)
+            return self._complete_image_analysis(ai_analysis, validation_result, category, user_city, user_location, include_html)
             
-            # **FIXED: Use the same method as chat system - format doctors as HTML**
-            doctors_html = ""
-            if doctors and self.medical_recommender and hasattr(self.medical_recommender, 'doctor_recommender'):
+        except Exception as e:
+            self.logger.error("Error analyzing medical image: %s", e)
+            return {
+                "success": False,
+                "error": f"Analysis failed: {str(e)}"
+            }
+    
+    def analyze_medical_images(self, images: List[bytes], image_type: str = None, user_city: str = None, user_location: dict = None,
+                               include_html: bool = False) -> List[Dict[str, Any]]:
+        """
+        Analyze several uploads (e.g. multi-view photos of one wound) with one vision call per image category
+        
+        Args:
+            images: Raw image bytes of each upload
+            image_type: Optional hint about image type, applied to every image
+            user_city: Optional user city for doctor recommendations
+            user_location: Optional user location dict with latitude/longitude
+            include_html: Also return each result's doctors as an HTML table
+            
+        Returns:
+            One analyze_medical_image-style result per upload, in order
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        validations = {}
+        by_category: Dict[str, List[int]] = {}
+        for index, image_data in enumerate(images):
+            try:
+                validation_result = self.validate_image(image_data)
+                if not validation_result["valid"]:
+                    results[index] = {"success": False, "error": validation_result["error"]}
+                    continue
+                category = self.detect_image_category(validation_result["image"], image_type)
+                validations[index] = validation_result
+                by_category.setdefault(category, []).append(index)
+            except Exception as e:
+                self.logger.error("Error analyzing medical image: %s", e)
+                results[index] = {"success": False, "error": f"Analysis failed: {str(e)}"}
+        
+        for category, indices in by_category.items():
+            ai_analyses = self.analyze_batch_with_openai_vision([validations[i]["image"] for i in indices], category)
+            for index, ai_analysis in zip(indices, ai_analyses):
                 try:
-                    # Use the exact same method that works in chat system
-                    doctors_html = self.medical_recommender.doctor_recommender.format_doctor_recommendations(doctors, specialist_type)
-                    print(f"✅ Generated HTML table for {len(doctors)} doctors")
+                    results[index] = (self._complete_image_analysis(ai_analysis, validations[index], category,
+                                                                    user_city, user_location, include_html)
+                                      if ai_analysis["success"] else ai_analysis)
                 except Exception as e:
-                    print(f"⚠️ Failed to format doctors as HTML: {e}")
-                    doctors_html = f"<p>Found {len(doctors)} {specialist_type.lower()}s but failed to format table.</p>"
-            else:
-                doctors_html = f"<p>No {specialist_type.lower()}s found in your area.</p>"
-            
-            return {
-                "success": True,
-                "analysis": {
-                    "ai_interpretation": ai_analysis["analysis_text"],
-                    "category": ai_analysis["category"],
-                    "specialist_type": specialist_type,
-                    "doctors": doctors,  # Keep raw data for compatibility
-                    "doctors_html": doctors_html,  # **NEW: Pre-formatted HTML table**
-                    "model_used": ai_analysis["model_used"],
-                    "image_info": {
-                        "dimensions": validation_result["dimensions"],
-                        "format": validation_result["format"],
-                        "category_detected": category
-                    }
+                    self.logger.error("Error analyzing medical image: %s", e)
+                    results[index] = {"success": False, "error": f"Analysis failed: {str(e)}"}
+        return results
+    
+    async def analyze_medical_image_async(self, image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None,
+                                          include_html: bool = False) -> Dict[str, Any]:
+        """
+        Awaitable mirror of analyze_medical_image
+        The vision call is awaited on AsyncOpenAI; image work and the blocking doctor lookup run in
+        worker threads, so one request's decode overlaps other requests' network waits
+        """
+        try:
+            validation_result = await _run_image_work(self.validate_image, image_data)
+            if not validation_result["valid"]:
+                return {
+                    "success": False,
+                    "error": validation_result["error"]
                 }
-            }
+            
+            image = validation_result["image"]
+            category = await _run_image_work(self.detect_image_category, image, image_type)
+            
+            ai_analysis = await self.analyze_with_openai_vision_async(image, category)
+            if not ai_analysis["success"]:
+                return ai_analysis
+            
+            return await asyncio.to_thread(self._complete_image_analysis, ai_analysis, validation_result,
+                                           category, user_city, user_location, include_html)
             
         except Exception as e:
-            self.logger.error(f"Error analyzing medical image: {e}")
+            self.logger.error("Error analyzing medical image: %s", e)
             return {
                 "success": False,
                 "error": f"Analysis failed: {str(e)}"
             }
+    
+    async def analyze_many_async(self, items: List[tuple], max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Analyze several (image_data, image_type, user_city, user_location) tuples concurrently
+        Concurrency is capped so a burst of uploads stays below the provider rate limit
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _bounded(item):
+            async with semaphore:
+                return await self.analyze_medical_image_async(*item)
+        
+        return await asyncio.gather(*(_bounded(item) for item in items))
+    
+    def _complete_image_analysis(self, ai_analysis: Dict[str, Any], validation_result: Dict[str, Any],
+                                 category: str, user_city: str = None, user_location: dict = None,
+                                 include_html: bool = False) -> Dict[str, Any]:
+        """Add doctor recommendations (and, if asked, their HTML table) to a successful vision analysis and build the response"""
+        # Get doctor recommendations with default sorting and location
+        specialist_type = ai_analysis["specialist_type"]
+        doctors = self.get_doctor_recommendations(specialist_type, user_city, "rating", user_location)
+        
+        analysis = {
+            "ai_interpretation": ai_analysis["analysis_text"],
+            "category": ai_analysis["category"],
+            "specialist_type": specialist_type,
+            "urgency": ai_analysis.get("urgency"),
+            "doctors": doctors,  # Keep raw data for compatibility
+            "model_used": ai_analysis["model_used"],
+            "image_info": {
+                "dimensions": validation_result["dimensions"],
+                "format": validation_result["format"],
+                "category_detected": category
+            }
+        }
+        if include_html:
+            analysis["doctors_html"] = self._format_doctors_html(doctors, specialist_type)  # Pre-formatted HTML table
+        
+        return {
+            "success": True,
+            "analysis": analysis
+        }
+    
+    def _format_doctors_html(self, doctors: List[Dict[str, Any]], specialist_type: str) -> str:
+        """HTML table of the doctors, reused while the same specialist lookup keeps returning the same doctors"""
+        if not (doctors and self.medical_recommender and hasattr(self.medical_recommender, 'doctor_recommender')):
+            return f"<p>No {specialist_type.lower()}s found in your area.</p>"
+        
+        cache_key = (tuple(doctor.get("name") for doctor in doctors), specialist_type)
+        cached = self._doctors_html_cache.get(cache_key)
+        if cached is not None:
+            self._doctors_html_cache.move_to_end(cache_key)
+            return cached
+        
+        try:
+            # **FIXED: Use the same method as chat system - format doctors as HTML**
+            doctors_html = self.medical_recommender.doctor_recommender.format_doctor_recommendations(doctors, specialist_type)
+            self.logger.debug("Generated HTML table for %d doctors", len(doctors))
+        except Exception as e:
+            self.logger.warning("Failed to format doctors as HTML: %s", e)
+            return f"<p>Found {len(doctors)} {specialist_type.lower()}s but failed to format table.</p>"
+        
+        self._doctors_html_cache[cache_key] = doctors_html
+        if len(self._doctors_html_cache) > _DOCTORS_HTML_CACHE_SIZE:
+            self._doctors_html_cache.popitem(last=False)
+        return doctors_html
 
-# Global analyzer instance
-medical_image_analyzer = MedicalImageAnalyzer()
+@functools.lru_cache(maxsize=1)
+def get_medical_image_analyzer() -> MedicalImageAnalyzer:
+    """Shared analyzer, created on first use rather than at import (clients and recommender load then)"""
+    return MedicalImageAnalyzer()
 
-def analyze_medical_image(image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None) -> Dict[str, Any]:
+def analyze_medical_image(image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None,
+                          include_html: bool = False) -> Dict[str, Any]:
     """
     Convenience function to analyze medical image
     
@@ -651,11 +1131,46 @@ def analyze_medical_image(image_data: bytes, image_type: str = None, user_city:
         image_type: Optional image type hint
         user_city: Optional user city
         user_location: Optional user location dict with latitude/longitude
+        include_html: Also return the doctors as an HTML table
+        
+    Returns:
+        Analysis results
+    """
+    return get_medical_image_analyzer().analyze_medical_image(image_data, image_type, user_city, user_location, include_html)
+
+def analyze_medical_images(images: List[bytes], image_type: str = None, user_city: str = None, user_location: dict = None,
+                           include_html: bool = False) -> List[Dict[str, Any]]:
+    """
+    Convenience function to analyze several medical images with batched vision calls
+    
+    Args:
+        images: Raw image bytes of each upload
+        image_type: Optional image type hint
+        user_city: Optional user city
+        user_location: Optional user location dict with latitude/longitude
+        include_html: Also return each result's doctors as an HTML table
+        
+    Returns:
+        Analysis results, one per image
+    """
+    return get_medical_image_analyzer().analyze_medical_images(images, image_type, user_city, user_location, include_html)
+
+async def analyze_medical_image_async(image_data: bytes, image_type: str = None, user_city: str = None, user_location: dict = None,
+                                      include_html: bool = False) -> Dict[str, Any]:
+    """
+    Awaitable convenience function to analyze medical image (for async routes)
+    
+    Args:
+        image_data: Raw image bytes
+        image_type: Optional image type hint
+        user_city: Optional user city
+        user_location: Optional user location dict with latitude/longitude
+        include_html: Also return the doctors as an HTML table
         
     Returns:
         Analysis results
     """
-    return medical_image_analyzer.analyze_medical_image(image_data, image_type, user_city, user_location)
+    return await get_medical_image_analyzer().analyze_medical_image_async(image_data, image_type, user_city, user_location, include_html)
 
 # Test the analyzer
 if __name__ == "__main__":
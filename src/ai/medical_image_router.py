@@ -8,6 +8,8 @@ import logging
 from typing import Dict, List, Any, Optional
 from PIL import Image
 import numpy as np
+from src.ai import medical_kernels
+from src.ai.keyword_matcher import KeywordMatcher
 
 # Import specialized analyzers
 try:
@@ -22,6 +24,14 @@ try:
 except ImportError:
     SKIN_ANALYZER_AVAILABLE = False
 
+# Fused X-ray statistics (color spread, contrast and edge/center means in one pass) when Numba is installed
+try:
+    from numba import njit
+    _xray_stats = njit(cache=True, parallel=True, fastmath=True)(medical_kernels.xray_stats)
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # Enhanced medical image type detection
 IMAGE_TYPES = {
     'skin': {
@@ -61,6 +71,28 @@ IMAGE_TYPES = {
     }
 }
 
+# Strong context indicators per detected type, in priority order (the first type hit wins)
+_CONTEXT_TYPE_KEYWORDS = {
+    # BONE/FRACTURE - Highest priority for medical images
+    'bone': ('fracture', 'broken', 'bone', 'x-ray', 'xray', 'radiograph', 'orthopedic', 'joint', 'spine', 'limb', 'break'),
+    # CHEST/LUNG X-RAYS
+    'xray': ('chest', 'lung', 'pneumonia', 'respiratory', 'breathing', 'thorax', 'ribs'),
+    # SKIN CONDITIONS
+    'skin': ('skin', 'mole', 'rash', 'acne', 'eczema', 'dermatitis', 'lesion', 'spot', 'blemish', 'pimple', 'melanoma'),
+    # EYE CONDITIONS
+    'eyes': ('eye', 'retina', 'vision', 'pupil', 'iris', 'fundus', 'glaucoma', 'cataract'),
+    # BRAIN/NEUROLOGICAL
+    'mri': ('brain', 'head', 'mri', 'neurological', 'stroke', 'headache'),
+    # NORMAL/GENERAL INDICATORS
+    'normal': ('selfie', 'portrait', 'normal', 'healthy', 'check-up', 'routine', 'no symptoms', 'general'),
+}
+_CONTEXT_TYPE_MATCHER = KeywordMatcher(_CONTEXT_TYPE_KEYWORDS)
+
+# Any of these in an otherwise unclassified context means a general medical examination
+_MEDICAL_INDICATOR_MATCHER = KeywordMatcher({
+    'general': ('pain', 'hurt', 'problem', 'condition', 'symptom', 'medical', 'doctor', 'hospital'),
+})
+
 class MedicalImageRouter:
     """
     Routes medical images to appropriate specialized analyzers
@@ -117,37 +149,11 @@ class MedicalImageRouter:
         if not context:
             return None
             
-        context_lower = context.lower()
-        
-        # BONE/FRACTURE - Highest priority for medical images
-        bone_keywords = ['fracture', 'broken', 'bone', 'x-ray', 'xray', 'radiograph', 'orthopedic', 'joint', 'spine', 'limb', 'break']
-        if any(keyword in context_lower for keyword in bone_keywords):
-            return 'bone'
-        
-        # CHEST/LUNG X-RAYS
-        chest_keywords = ['chest', 'lung', 'pneumonia', 'respiratory', 'breathing', 'thorax', 'ribs']
-        if any(keyword in context_lower for keyword in chest_keywords):
-            return 'xray'
-        
-        # SKIN CONDITIONS
-        skin_keywords = ['skin', 'mole', 'rash', 'acne', 'eczema', 'dermatitis', 'lesion', 'spot', 'blemish', 'pimple', 'melanoma']
-        if any(keyword in context_lower for keyword in skin_keywords):
-            return 'skin'
-        
-        # EYE CONDITIONS
-        eye_keywords = ['eye', 'retina', 'vision', 'pupil', 'iris', 'fundus', 'glaucoma', 'cataract']
-        if any(keyword in context_lower for keyword in eye_keywords):
-            return 'eyes'
-        
-        # BRAIN/NEUROLOGICAL
-        brain_keywords = ['brain', 'head', 'mri', 'neurological', 'stroke', 'headache']
-        if any(keyword in context_lower for keyword in brain_keywords):
-            return 'mri'
-        
-        # NORMAL/GENERAL INDICATORS
-        normal_keywords = ['selfie', 'portrait', 'normal', 'healthy', 'check-up', 'routine', 'no symptoms', 'general']
-        if any(keyword in context_lower for keyword in normal_keywords):
-            return 'normal'
+        # Every type's keywords found in one pass over the context, then resolved by priority
+        detected = _CONTEXT_TYPE_MATCHER.groups_in(context.lower())
+        for image_type in _CONTEXT_TYPE_KEYWORDS:
+            if image_type in detected:
+                return image_type
         
         return None
     
@@ -203,8 +209,7 @@ class MedicalImageRouter:
             return 'normal'
         
         # If there's any medical context, default to general medical
-        medical_indicators = ['pain', 'hurt', 'problem', 'condition', 'symptom', 'medical', 'doctor', 'hospital']
-        if any(word in context.lower() for word in medical_indicators):
+        if _MEDICAL_INDICATOR_MATCHER.keywords_in(context.lower()):
             return 'general'  # General medical examination
         
         # Otherwise, normal photo
@@ -213,6 +218,9 @@ class MedicalImageRouter:
     def _looks_like_xray(self, img_array: np.ndarray) -> bool:
         """Detect if image looks like an X-ray"""
         try:
+            if NUMBA_AVAILABLE and img_array.ndim == 3 and img_array.shape[2] >= 3 and img_array.dtype == np.uint8:
+                return self._looks_like_xray_fused(img_array)
+            
             # X-rays are typically grayscale or have low color variation
             if len(img_array.shape) == 3:
                 # Check if image is mostly grayscale (low color variation)
@@ -275,6 +283,39 @@ class MedicalImageRouter:
         except Exception:
             return False
     
+    def _looks_like_xray_fused(self, img_array: np.ndarray) -> bool:
+        """_looks_like_xray for a uint8 color array, from one fused pass instead of per-channel float temporaries"""
+        height, width, channels = img_array.shape
+        edge_rows, edge_cols = height // 10, width // 10
+        # Thinner than ten pixels: the edge slabs are empty and the edge mean undefined, never an X-ray
+        if edge_rows == 0 or edge_cols == 0:
+            return False
+        y0, y1, x0, x1 = height // 4, 3 * height // 4, width // 4, 3 * width // 4
+        
+        (total, total_sq, diff_rg, diff_rb, diff_gb,
+         top, bottom, left, right, center) = _xray_stats(img_array, edge_rows, edge_cols, y0, y1, x0, x1)
+        
+        # If color variation is too high, it's not an X-ray
+        pixels = height * width
+        color_variation = (diff_rg + diff_rb + diff_gb) / (3 * pixels)
+        if color_variation > 15:
+            return False
+        
+        # Gray is the channel mean; the kernel sums channel totals, so divide by the channel count
+        mean_intensity = total / (pixels * channels)
+        contrast = np.sqrt(max(0.0, total_sq / (pixels * channels * channels) - mean_intensity * mean_intensity))
+        
+        edge_mean = (top / (edge_rows * width) + bottom / (edge_rows * width)
+                     + left / (height * edge_cols) + right / (height * edge_cols)) / (4 * channels)
+        center_mean = center / ((y1 - y0) * (x1 - x0) * channels)
+        edge_to_center_ratio = edge_mean / (center_mean + 1)
+        
+        # Same criteria as the array path in _looks_like_xray
+        return (contrast > 60 and
+                mean_intensity < 100 and
+                edge_to_center_ratio < 0.7 and
+                contrast > 70)
+    
     def _looks_like_skin(self, img_array: np.ndarray) -> bool:
         """Detect if image looks like skin"""
         try:
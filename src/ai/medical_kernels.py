@@ -0,0 +1,131 @@
+# src/ai/medical_kernels.py
+"""
+Numeric kernels for fast medical image analysis
+Purpose: Plain-Python loop kernels that fast_medical_ai JIT-compiles with Numba,
+and that scripts/build_medical_kernels.py compiles ahead of time
+"""
+import numpy as np
+
+try:
+    from numba import prange
+except ImportError:
+    prange = range
+
+
+def pixel_stats(img):
+    """Per-channel sums (in array channel order), sum of squares and pixel count of an HxWx3 uint8 array in one fused pass"""
+    height, width = img.shape[0], img.shape[1]
+    # Integer accumulators are exact and vectorize; float ones serialize on the add chain
+    sum_0 = 0
+    sum_1 = 0
+    sum_2 = 0
+    sum_sq = 0
+    for y in prange(height):
+        for x in range(width):
+            c0 = np.int64(img[y, x, 0])
+            c1 = np.int64(img[y, x, 1])
+            c2 = np.int64(img[y, x, 2])
+            sum_0 += c0
+            sum_1 += c1
+            sum_2 += c2
+            sum_sq += c0 * c0 + c1 * c1 + c2 * c2
+    return float(sum_0), float(sum_1), float(sum_2), float(sum_sq), float(height * width)
+
+
+def edge_count(gray, threshold_sq):
+    """Count interior pixels whose 3x3 Sobel magnitude squared exceeds threshold_sq"""
+    height, width = gray.shape
+    count = 0
+    for y in prange(1, height - 1):
+        for x in range(1, width - 1):
+            gx = (int(gray[y - 1, x + 1]) + 2 * int(gray[y, x + 1]) + int(gray[y + 1, x + 1])
+                  - int(gray[y - 1, x - 1]) - 2 * int(gray[y, x - 1]) - int(gray[y + 1, x - 1]))
+            gy = (int(gray[y + 1, x - 1]) + 2 * int(gray[y + 1, x]) + int(gray[y + 1, x + 1])
+                  - int(gray[y - 1, x - 1]) - 2 * int(gray[y - 1, x]) - int(gray[y - 1, x + 1]))
+            if gx * gx + gy * gy > threshold_sq:
+                count += 1
+    return count
+
+
+def dark_pixel_stats(gray, k):
+    """Mean, population std and count of pixels darker than mean - k * std of a uint8 gray image (two passes, one call)"""
+    height, width = gray.shape
+    total = 0
+    total_sq = 0
+    for y in prange(height):
+        for x in range(width):
+            v = np.int64(gray[y, x])
+            total += v
+            total_sq += v * v
+    n = height * width
+    mean = total / n
+    std = np.sqrt(max(0.0, total_sq / n - mean * mean))
+    threshold = mean - k * std
+    dark = 0
+    for y in prange(height):
+        for x in range(width):
+            if gray[y, x] < threshold:
+                dark += 1
+    return mean, std, dark
+
+
+def xray_stats(img, edge_rows, edge_cols, y0, y1, x0, x1):
+    """
+    One pass over an HxWxC uint8 array (C >= 3): sums of the per-pixel channel total and its square,
+    of |R-G|, |R-B| and |G-B|, and of the channel total over the top, bottom, left and right edge
+    slabs (edge_rows / edge_cols deep) and the center rectangle [y0, y1) x [x0, x1)
+    """
+    height, width, channels = img.shape
+    total = 0
+    total_sq = 0
+    diff_rg = 0
+    diff_rb = 0
+    diff_gb = 0
+    top = 0
+    bottom = 0
+    left = 0
+    right = 0
+    center = 0
+    for y in prange(height):
+        for x in range(width):
+            r = np.int64(img[y, x, 0])
+            g = np.int64(img[y, x, 1])
+            b = np.int64(img[y, x, 2])
+            s = r + g + b
+            for c in range(3, channels):
+                s += np.int64(img[y, x, c])
+            total += s
+            total_sq += s * s
+            diff_rg += abs(r - g)
+            diff_rb += abs(r - b)
+            diff_gb += abs(g - b)
+            if y < edge_rows:
+                top += s
+            if y >= height - edge_rows:
+                bottom += s
+            if x < edge_cols:
+                left += s
+            if x >= width - edge_cols:
+                right += s
+            if y0 <= y < y1 and x0 <= x < x1:
+                center += s
+    return total, total_sq, diff_rg, diff_rb, diff_gb, top, bottom, left, right, center
+
+
+def boost_confidences(is_urgent, has_melanoma, has_pneumonia, has_normal,
+                      category_code, high_contrast, base, jitter):
+    """Apply symptom and image-feature boosts to drawn confidences, clipped to [30, 95]"""
+    n = base.shape[0]
+    out = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        confidence = base[i] + jitter[i]
+        if category_code == 1 and is_urgent[i]:
+            confidence += 15
+        elif category_code == 2 and has_melanoma[i]:
+            confidence += 20
+        elif category_code == 3 and has_pneumonia[i]:
+            confidence += 25
+        if high_contrast and not has_normal[i]:
+            confidence += 10
+        out[i] = min(95, max(30, confidence))
+    return out
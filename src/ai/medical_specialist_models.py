@@ -4,11 +4,16 @@ Specialized Medical Models Integration
 Advanced AI models for specific medical domains
 """
 import logging
-import base64
 from typing import Dict, List, Any, Optional, Tuple
 import json
 import io
 
+# SIMD-accelerated base64 when available (same API as the stdlib module)
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Core imports
 import numpy as np
 from PIL import Image
@@ -192,8 +197,7 @@ class MedicalSpecialistModel:
             # Convert bytes to PIL Image
             if isinstance(image_data, str):
                 # Handle base64 encoded images
-                if 'base64,' in image_data:
-                    image_data = image_data.split('base64,')[1]
+                image_data = image_data.rpartition('base64,')[2]  # strip any data-URL prefix
                 image_data = base64.b64decode(image_data)
             
             image = Image.open(io.BytesIO(image_data))
@@ -288,8 +292,8 @@ class MedicalSpecialistModel:
     def _analyze_with_rules(self, image: Image.Image) -> Dict[str, Any]:
         """Rule-based analysis for fallback"""
         try:
-            # Convert to numpy array for analysis
-            img_array = np.array(image)
+            # Convert to numpy array for analysis (read-only view of PIL's buffer; the rules only read it)
+            img_array = np.asarray(image)
             
             # Basic image analysis
             height, width = img_array.shape[:2]
@@ -374,8 +378,10 @@ class MedicalSpecialistModel:
         
         if contrast > 50:  # High contrast typical of X-rays
             # Look for potential abnormalities
+            # Full resolution: the 100/200 thresholds and the 10% cutoff were set on it, and
+            # downsampling changes edge density a lot
             edges = cv2.Canny(gray, 100, 200)
-            edge_density = np.sum(edges > 0) / edges.size * 100
+            edge_density = cv2.countNonZero(edges) / edges.size * 100
             
             if edge_density > 10:
                 conditions.append({
@@ -4,7 +4,6 @@ Medical Vision-Language Models Integration
 Specialized VLMs for medical image analysis and diagnosis
 """
 import logging
-import base64
 import json
 import io
 from typing import Dict, List, Any, Optional, Tuple
@@ -12,6 +11,12 @@ import requests
 from PIL import Image
 import numpy as np
 
+# SIMD-accelerated base64 when available (same API as the stdlib module)
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Try to import advanced medical libraries
 try:
     import torch
@@ -197,8 +202,7 @@ class MedicalVLMAnalyzer:
         try:
             # Convert bytes to PIL Image
             if isinstance(image_data, str):
-                if 'base64,' in image_data:
-                    image_data = image_data.split('base64,')[1]
+                image_data = image_data.rpartition('base64,')[2]  # strip any data-URL prefix
                 image_data = base64.b64decode(image_data)
             
             image = Image.open(io.BytesIO(image_data))
@@ -4,7 +4,6 @@ Specialized Medical AI Models Integration
 CheXNet, DermNet, FastMRI and other specialized models
 """
 import logging
-import base64
 import io
 import json
 from typing import Dict, List, Any, Optional, Tuple
@@ -12,6 +11,12 @@ import numpy as np
 from PIL import Image
 import cv2
 
+# SIMD-accelerated base64 when available (same API as the stdlib module)
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Try to import medical deep learning libraries
 try:
     import torch
@@ -291,8 +296,7 @@ class SpecializedMedicalModel:
         try:
             # Convert to PIL Image
             if isinstance(image_data, str):
-                if 'base64,' in image_data:
-                    image_data = image_data.split('base64,')[1]
+                image_data = image_data.rpartition('base64,')[2]  # strip any data-URL prefix
                 image_data = base64.b64decode(image_data)
             
             image = Image.open(io.BytesIO(image_data))